@@ -0,0 +1,129 @@
+"""
+Benchmark of reading the comments of a repository from the Gogs database. Compares the previous path, which ran one
+query per issue, with reading the comments of `comment_batch_size` issues per query through
+`GogsDbReader.get_comments_by_issue`, and with reading all comments in a single query, as with `prefetch_comments`.
+The queries are answered by a fake cursor, which counts the statements executed and waits for a simulated round trip
+to the database for each of them, so no database is needed.
+
+Run from the root of the repository:
+
+	python benchmarks/comment_queries.py --issues 10000 --latency 0.0005
+"""
+import os
+import sys
+import threading
+import time
+
+import click
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classes.GogsDbReader import GogsDbReader  # noqa: E402
+
+
+class FakeCursor(object):
+	"""Prepared cursor that answers the comment statements of `GogsDbReader` with synthetic rows"""
+	column_names = ("id", "issue_id", "type", "content", "commit_sha", "created_unix", "updated_unix", "name", "email")
+
+	def __init__(self, connection: 'FakeConnection'):
+		self.connection = connection
+		self.rows = []
+
+	def execute(self, statement: str, params: tuple) -> None:
+		self.connection.executed += 1
+		time.sleep(self.connection.latency)
+		if "IN (" in statement:
+			issue_ids = sorted(set(params))
+		elif "repo_id" in statement:
+			issue_ids = range(self.connection.issues)
+		else:
+			issue_ids = params
+		self.rows = [
+			(issue_id * self.connection.comments + i, issue_id, 0, f"Comment {i} on issue {issue_id}", None,
+			 1600000000 + i, 1600000000 + i, f"user{i}", f"user{i}@example.com")
+			for issue_id in issue_ids for i in range(self.connection.comments)]
+
+	def fetchmany(self, size: int) -> [tuple]:
+		batch, self.rows = self.rows[:size], self.rows[size:]
+		return batch
+
+
+class FakeConnection(object):
+	def __init__(self, issues: int, comments: int, latency: float):
+		self.issues = issues
+		self.comments = comments
+		self.latency = latency
+		self.executed = 0
+
+	def cursor(self, prepared: bool = False) -> FakeCursor:
+		return FakeCursor(self)
+
+
+def create_reader(connection: FakeConnection, batch_size: int, fetch_size: int) -> GogsDbReader:
+	"""Creates a reader that reads from the fake connection, without connecting to Gogs"""
+	reader = object.__new__(GogsDbReader)
+	reader.conn = reader.comment_connection = connection
+	reader.repo = 1
+	reader.query_count = 0
+	reader._GogsDbReader__query_count_lock = threading.Lock()
+	reader._GogsDbReader__cursors = dict()
+	reader.fetch_size = fetch_size
+	reader.comment_batch_size = batch_size
+	reader.comments_by_issue = None
+	reader.statements = dict(
+		GogsDbReader.statements,
+		comments_for_issues=GogsDbReader.statements["comments_for_issues"].replace(
+			"{issue_ids}", ", ".join(["%s"] * batch_size)),
+		# The query of the previous path, which was run once for every issue
+		comments_for_issue='''
+			SELECT comment.id, comment.issue_id, comment.type, comment.content, comment.commit_sha,
+			comment.created_unix, comment.updated_unix, user.name, user.email
+			FROM comment
+			LEFT JOIN user on comment.poster_id=user.id WHERE issue_id = %s
+			ORDER BY comment.created_unix asc
+			''')
+	return reader
+
+
+def per_issue(reader: GogsDbReader, issue_ids: [int]):
+	"""The previous path, which queried the comments of every issue when it was migrated"""
+	for issue_id in issue_ids:
+		yield issue_id, reader._select("comments_for_issue", issue_id)
+
+
+def whole_repository(reader: GogsDbReader, issue_ids: [int]):
+	"""Reads the comments of all issues in a single query, as `prefetch` does with `prefetch_comments`"""
+	comments = dict()
+	for row in reader._stream("comments", reader.repo):
+		comments.setdefault(row.pop("issue_id"), []).append(row)
+	for issue_id in issue_ids:
+		yield issue_id, comments.pop(issue_id, [])
+
+
+@click.command()
+@click.option("--issues", default=10_000, help="Number of issues in the repository")
+@click.option("--comments", default=5, help="Number of comments on each issue")
+@click.option("--latency", default=0.0005, help="Seconds of a round trip to the database for each query")
+@click.option("--batch-size", default=100, help="Number of issues of which the comments are read at once")
+@click.option("--fetch-size", default=1000, help="Number of rows fetched at once (fetch_size)")
+def benchmark(issues, comments, latency, batch_size, fetch_size):
+	issue_ids = list(range(issues))
+	click.echo(
+		f"{issues} issues with {comments} comments each, {latency * 1000:.2f} ms round trip to the database per query")
+	click.echo(f"{'':28} {'queries':>8} {'time':>9} {'issues/s':>10}")
+	for name, read in [
+		("one query per issue (before)", per_issue),
+		(f"batches of {batch_size} issues", GogsDbReader.get_comments_by_issue),
+		("whole repository", whole_repository)
+	]:
+		connection = FakeConnection(issues, comments, latency)
+		reader = create_reader(connection, batch_size, fetch_size)
+		start = time.perf_counter()
+		read_comments = sum(len(rows) for _, rows in read(reader, issue_ids))
+		duration = time.perf_counter() - start
+		assert read_comments == issues * comments
+		click.echo(f"{name:28} {connection.executed:8} {duration:8.2f}s {issues / duration:10.0f}")
+
+
+if __name__ == "__main__":
+	benchmark()
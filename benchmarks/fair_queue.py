@@ -0,0 +1,140 @@
+"""
+Benchmark of sharing the rate limit budgets between migrations of several repositories. Simulates repositories that
+post comments, each from several threads, next to one repository that only reads (like the marker scan or the user
+lookups), with a content creation limit and a core rate limit scaled down to seconds. Reports the requests per second
+each repository gets, with the previous single turn, of which the holder waited for its slot inside the turn, and with
+a fair queue per budget. No database or Github connection is needed.
+
+Run from the root of the repository:
+
+	python benchmarks/fair_queue.py --posting 3 --threads 4 --duration 10
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+import click
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classes.ContentCreationScheduler import ContentCreationScheduler  # noqa: E402
+from classes.FairQueue import FairQueue  # noqa: E402
+from classes.RateLimiter import RateLimiter  # noqa: E402
+
+
+class FairQueueBefore(object):
+	"""The single turn shared by all requests, of which the holder waited for its slot before passing the turn on"""
+
+	def __init__(self):
+		self.__condition = threading.Condition()
+		self.__waiting = dict()
+		self.__order = deque()
+		self.__busy = False
+
+	@contextmanager
+	def turn(self, key: str):
+		ticket = object()
+		with self.__condition:
+			if key not in self.__waiting:
+				self.__waiting[key] = deque()
+				self.__order.append(key)
+			self.__waiting[key].append(ticket)
+			while self.__busy or self.__order[0] != key or self.__waiting[key][0] is not ticket:
+				self.__condition.wait()
+			self.__busy = True
+			self.__waiting[key].popleft()
+			self.__order.popleft()
+			if len(self.__waiting[key]):
+				self.__order.append(key)
+			else:
+				del self.__waiting[key]
+		try:
+			yield
+		finally:
+			with self.__condition:
+				self.__busy = False
+				self.__condition.notify_all()
+
+
+def create_budgets(core_per_second: int, content_per_second: int) -> (RateLimiter, ContentCreationScheduler):
+	core = RateLimiter("core", burst=1)
+	core.update({'X-RateLimit-Remaining': core_per_second * 3600, 'X-RateLimit-Reset': int(time.time()) + 3600})
+	return core, ContentCreationScheduler([(content_per_second, 1)])
+
+
+def run(send, repositories: [(str, bool, int)], duration: float, latency: float) -> Counter:
+	"""
+	:param send:            Function that paces one request of the given repository, of which it is given the key, and
+							whether the request creates content
+	:param repositories:    List of tuples of the key of each repository, whether it posts, and its number of threads
+	:return:                Number of requests sent by each repository
+	"""
+	sent = Counter()
+	lock = threading.Lock()
+	stop = time.time() + duration
+
+	def worker(key, posts):
+		while time.time() < stop:
+			send(key, posts)
+			time.sleep(latency)
+			with lock:
+				if time.time() < stop:
+					sent[key] += 1
+
+	threads = [
+		threading.Thread(target=worker, args=(key, posts), daemon=True)
+		for key, posts, count in repositories for _ in range(count)]
+	for thread in threads:
+		thread.start()
+	time.sleep(duration)
+	return sent
+
+
+@click.command()
+@click.option("--posting", default=3, help="Number of repositories that post comments")
+@click.option("--threads", default=4, help="Number of threads of each repository (comment_workers)")
+@click.option("--core-rate", default=50, help="Core API requests per second")
+@click.option("--content-rate", default=5, help="Content creation requests per second")
+@click.option("--latency", default=0.02, help="Seconds Github takes to answer a request")
+@click.option("--duration", default=10.0, help="Seconds to run each case")
+def benchmark(posting, threads, core_rate, content_rate, latency, duration):
+	repositories = [(f"posting-{i}", True, threads) for i in range(posting)] + [("reading", False, threads)]
+
+	def before():
+		core, content = create_budgets(core_rate, content_rate)
+		queue = FairQueueBefore()
+
+		def send(key, posts):
+			if posts:
+				with queue.turn(key):
+					content.acquire()
+			with queue.turn(key):
+				core.acquire()
+		return send
+
+	def after():
+		core, content = create_budgets(core_rate, content_rate)
+		queues = dict(core=FairQueue(), content=FairQueue())
+
+		def send(key, posts):
+			if posts:
+				content.wait(queues["content"].reserve(key, content.reserve))
+			core.wait(queues["core"].reserve(key, core.reserve))
+		return send
+
+	click.echo(
+		f"{posting} repositories posting and 1 reading, {threads} threads each, {core_rate} core and "
+		f"{content_rate} content creation requests per second")
+	click.echo(f"{'':24}" + "".join(f"{key:>12}" for key, _, _ in repositories) + f"{'total':>12}")
+	for name, create in [("single turn (before)", before), ("queue per budget", after)]:
+		sent = run(create(), repositories, duration, latency)
+		click.echo(
+			f"{name:24}" + "".join(f"{sent[key] / duration:10.2f}/s" for key, _, _ in repositories) +
+			f"{sum(sent.values()) / duration:10.2f}/s")
+
+
+if __name__ == "__main__":
+	benchmark()
@@ -0,0 +1,119 @@
+"""
+Memory benchmark of the Gogs models. Builds issues and comments from synthetic rows, and reports the memory they keep
+alive per object, for the compact `__slots__` models and for the previous models, which kept the full row, a reference
+to the reader and the API, and preformatted time strings. No database or Github connection is needed.
+
+Run from the root of the repository:
+
+	python benchmarks/model_memory.py --issues 100000 --comments 1000000
+"""
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+import click
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classes.GogsDbReader import GogsDbReader  # noqa: E402
+from classes.gogs_model.Comment import Comment  # noqa: E402
+from classes.gogs_model.Issue import Issue  # noqa: E402
+
+
+class IssueBefore(object):
+	"""The fields the issue model kept before it was made compact"""
+
+	def __init__(self, api, db_reader, row: dict):
+		self.api = api
+		self.db_reader = db_reader
+		self.row = row
+
+		self.id = row["id"]
+		self.key = f"issue:{row['id']}"
+		self.index = row["index"]
+		self.name = row["name"]
+		self.content = row["content"]
+		self.milestone_id = row["milestone_id"] if row["milestone_id"] > 0 else None
+		self.is_closed = row["is_closed"]
+		self.is_pull = row["is_pull"]
+		self.deadline_unix = GogsDbReader.unix_to_github_time(row["deadline_unix"])
+		self.created = GogsDbReader.unix_to_human_time(row["created_unix"])
+		self.updated = GogsDbReader.unix_to_human_time(row["updated_unix"])
+		self.creator = row["creator"]
+		self.assignee = row["assignee"]
+
+		self.comments = []
+
+
+class CommentBefore(object):
+	"""The fields the comment model kept before it was made compact"""
+
+	def __init__(self, db_reader, issue_type: str, row: dict):
+		self.db_reader = db_reader
+		self.issue_type = issue_type
+		self.row = row
+		self.key = f"comment:{row['id']}"
+		self.content = row['content']
+		self.created_unix = row['created_unix']
+		self.created = GogsDbReader.unix_to_human_time(row['created_unix'])
+		self.updated = GogsDbReader.unix_to_human_time(row['updated_unix'])
+
+
+def issue_rows(count: int):
+	"""Generates rows with the columns of the `issues` statement, as returned by `GogsDbReader._stream`"""
+	for i in range(count):
+		yield dict(
+			id=i, index=i + 1, name=f"Issue {i}", content=f"Content of issue {i}", milestone_id=i % 3, is_closed=i % 2,
+			is_pull=0, deadline_unix=0, created_unix=1600000000 + i, updated_unix=1600000000 + i * 2,
+			creator=f"user{i % 50}", assignee=f"user{i % 7}" if i % 4 else None)
+
+
+def comment_rows(count: int):
+	"""Generates rows with the columns of the `comments` statement, as returned by `GogsDbReader._stream`"""
+	for i in range(count):
+		yield dict(
+			id=i, issue_id=i // 10, type=0 if i % 10 else 2, content=f"Comment {i}", commit_sha=None,
+			created_unix=1600000000 + i, updated_unix=1600000000 + i, name=f"user{i % 50}",
+			email=f"user{i % 50}@example.com")
+
+
+def measure(build, count: int) -> (float, float):
+	"""
+	:param build:   Function that builds and returns all objects
+	:return:        Tuple of the bytes kept alive per object, and the time it took to build the objects
+	"""
+	gc.collect()
+	tracemalloc.start()
+	start = time.perf_counter()
+	objects = build()
+	duration = time.perf_counter() - start
+	gc.collect()
+	size = tracemalloc.get_traced_memory()[0]
+	tracemalloc.stop()
+	del objects
+	return size / count, duration
+
+
+@click.command()
+@click.option("--issues", default=100_000, help="Number of issues to build")
+@click.option("--comments", default=1_000_000, help="Number of comments to build")
+def benchmark(issues, comments):
+	# Stand-ins for the reader and the API, which the previous models referenced but did not own
+	reader, api = object(), object()
+	cases = [
+		("issues, before", issues, lambda: [IssueBefore(api, reader, row) for row in issue_rows(issues)]),
+		("issues, __slots__", issues, lambda: [Issue(row) for row in issue_rows(issues)]),
+		("comments, before", comments, lambda: [CommentBefore(reader, "issue", row) for row in comment_rows(comments)]),
+		("comments, __slots__", comments, lambda: [Comment("issue", row) for row in comment_rows(comments)]),
+	]
+
+	click.echo(f"{'':20} {'objects':>10} {'bytes/object':>13} {'total MB':>9} {'build time':>11}")
+	for name, count, build in cases:
+		per_object, duration = measure(build, count)
+		click.echo(f"{name:20} {count:10} {per_object:13.0f} {per_object * count / 1e6:9.1f} {duration:10.2f}s")
+
+
+if __name__ == "__main__":
+	benchmark()
@@ -0,0 +1,93 @@
+"""
+Benchmark of the render stage. Renders synthetic issues and comments, with issue references, @mentions and implicit
+codeblocks in their bodies, with `render_workers` set to each of the given numbers of processes, and reports how the
+render throughput scales with the number of cores. No database or Github connection is needed.
+
+Run from the root of the repository:
+
+	python benchmarks/render_throughput.py --workers 0,1,2,4,8
+"""
+import os
+import random
+import sys
+import time
+
+import click
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classes.RenderContext import RenderContext  # noqa: E402
+from classes.RenderStage import RenderStage  # noqa: E402
+from classes.gogs_model.Issue import Issue  # noqa: E402
+
+
+def create_body(rng: random.Random, issues: int, users: int, size: int) -> str:
+	"""Creates a body of about `size` characters of prose with references and mentions, and an indented codeblock"""
+	lines, length = [], 0
+	while length < size:
+		words = [
+			f"#{rng.randint(1, issues)}" if rng.random() < 0.05 else
+			f"@user{rng.randint(0, users)}" if rng.random() < 0.03 else
+			rng.choice(["lorem", "ipsum", "dolor", "sit", "amet", "consectetur"])
+			for _ in range(12)]
+		lines.append(" ".join(words))
+		if rng.random() < 0.1:
+			lines.extend(["", "    for item in items:", "        process(item)", ""])
+		length += len(lines[-1]) + 1
+	return "\n".join(lines)
+
+
+def create_items(count: int, comments: int, issues: int, users: int, size: int) -> [(Issue, [dict])]:
+	""":return: List of tuples of each issue and the comment rows on it, as read from Gogs"""
+	rng = random.Random(42)
+	items = []
+	for i in range(count):
+		issue = Issue(dict(
+			id=i, index=i + 1, name=f"Issue {i}", content=create_body(rng, issues, users, size), milestone_id=0,
+			is_closed=i % 2, is_pull=0, created_unix=1600000000 + i, updated_unix=1600000000 + i,
+			creator=f"user{i % users}", assignee=None))
+		rows = [
+			dict(
+				id=i * comments + j, type=0, content=create_body(rng, issues, users, size), commit_sha=None,
+				created_unix=1600000000 + j, updated_unix=1600000000 + j, name=f"user{j % users}",
+				email=f"user{j % users}@example.com")
+			for j in range(comments)]
+		items.append((issue, rows))
+	return items
+
+
+@click.command()
+@click.option("--workers", default="0,1,2,4", help="Comma separated numbers of render processes to measure")
+@click.option("--issues", default=2000, help="Number of issues to render")
+@click.option("--comments", default=10, help="Number of comments on each issue")
+@click.option("--body-size", default=2000, help="Number of characters in each body")
+@click.option("--users", default=200, help="Number of Gogs users")
+@click.option("--chunk-size", default=100, help="Number of items rendered at once by a process (render_chunk_size)")
+def benchmark(workers, issues, comments, body_size, users, chunk_size):
+	items = create_items(issues, comments, issues, users, body_size)
+	github_users = dict((f"user{i}@example.com", f"github-user{i}" if i % 2 else None) for i in range(users))
+	context = RenderContext(
+		dict((f"user{i}", f"user{i}@example.com") for i in range(users)),
+		dict((f"user{i}", f"github-user{i}" if i % 2 else None) for i in range(users + 1)),
+		"python", False, dict((i, i + 100) for i in range(1, issues + 1)))
+	rendered_items = issues * (comments + 1)
+
+	click.echo(f"Rendering {issues} issues with {comments} comments each, on {os.cpu_count()} available cores")
+	click.echo(f"{'workers':>8} {'time':>9} {'items/s':>10} {'speed-up':>9}")
+	baseline = None
+	for count in (int(w) for w in workers.split(",")):
+		with RenderStage(context, count, chunk_size) as stage:
+			# Start the processes before measuring, as a migration starts them once
+			list(stage.render(RenderStage.render_issues, [items[0][0]] * max(1, count), lambda chunk: github_users))
+			start = time.perf_counter()
+			for _ in stage.render(RenderStage.render_issues, (issue for issue, _ in items), lambda chunk: github_users):
+				pass
+			for _ in stage.render(RenderStage.render_comments, items, lambda chunk: github_users):
+				pass
+			duration = time.perf_counter() - start
+		baseline = duration if baseline is None else baseline
+		click.echo(f"{count:8} {duration:8.2f}s {rendered_items / duration:10.0f} {baseline / duration:8.2f}x")
+
+
+if __name__ == "__main__":
+	benchmark()
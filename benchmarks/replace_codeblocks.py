@@ -0,0 +1,86 @@
+"""
+Benchmark of converting implicit (indented) codeblocks to fenced codeblocks in multi-megabyte bodies, like the log dumps
+that are pasted in issues and comments. Compares `GogsDbReader.replace_codeblocks` with the previous implementation,
+which built its output by string concatenation. No database or Github connection is needed.
+
+Run from the root of the repository:
+
+	python benchmarks/replace_codeblocks.py --sizes 1,4,16
+"""
+import os
+import random
+import sys
+import time
+
+import click
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classes.GogsDbReader import GogsDbReader  # noqa: E402
+
+
+def create_body(size: int, rng: random.Random) -> str:
+	"""
+	Creates a body of about `size` characters of prose, indented log dumps with blank lines in them, and fenced
+	codeblocks with indented lines, which have to be left as they are
+	"""
+	lines, length = [], 0
+	while length < size:
+		kind = rng.random()
+		if kind < 0.5:
+			block = [f"    {time.strftime('%H:%M:%S')} DEBUG worker-{i} processed item {rng.randint(0, 10 ** 6)}"
+					for i in range(rng.randint(5, 200))]
+			block.insert(len(block) // 2, "")
+		elif kind < 0.6:
+			block = ["```python"] + [f"    value_{i} = compute({i})" for i in range(rng.randint(2, 20))] + ["```"]
+		else:
+			block = ["Some explanation of what went wrong, with `inline code` and a reference to #42."] * rng.randint(1, 5)
+		lines.extend(block + [""])
+		length += sum(len(line) + 1 for line in block) + 1
+	return "\n".join(lines)
+
+
+def replace_codeblocks_before(content: str, language: str) -> str:
+	"""The implementation before the linear-time converter"""
+	in_codeblock = False
+	new_content = ""
+	for line in content.splitlines():
+		if line.startswith(" " * 4):
+			if not in_codeblock:
+				new_content += f"```{language}\n"
+			in_codeblock = True
+			new_content += line[4:] + "\n"
+		else:
+			if not line.strip(" ") == "" and in_codeblock:
+				new_content += "```\n"
+				in_codeblock = False
+			new_content += line + "\n"
+
+	return new_content
+
+
+def measure(function, body: str, repeat: int) -> float:
+	""":return: Best time in seconds to convert the body"""
+	best = float("inf")
+	for _ in range(repeat):
+		start = time.perf_counter()
+		function(body, "shell")
+		best = min(best, time.perf_counter() - start)
+	return best
+
+
+@click.command()
+@click.option("--sizes", default="1,4,16", help="Comma separated sizes of the bodies to convert, in megabytes")
+@click.option("--repeat", default=3, help="Number of measurements, of which the best is reported")
+def benchmark(sizes, repeat):
+	rng = random.Random(42)
+	click.echo(f"{'size':>8} {'before':>12} {'linear':>12} {'linear MB/s':>12}")
+	for megabytes in (float(size) for size in sizes.split(",")):
+		body = create_body(int(megabytes * 1e6), rng)
+		before = measure(replace_codeblocks_before, body, repeat)
+		after = measure(GogsDbReader.replace_codeblocks, body, repeat)
+		click.echo(f"{megabytes:6.1f}MB {before:11.3f}s {after:11.3f}s {len(body) / 1e6 / after:12.1f}")
+
+
+if __name__ == "__main__":
+	benchmark()
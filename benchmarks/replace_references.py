@@ -0,0 +1,107 @@
+"""
+Micro-benchmark of rewriting issue references and @mentions in issue and comment bodies. Compares the single-pass
+rewriter of `GogsDbReader.replace_references` with the previous implementation, which called `str.replace` once for
+every reference found. No database or Github connection is needed.
+
+Run from the root of the repository:
+
+	python benchmarks/replace_references.py --body-size 100000 --references 5000
+"""
+import os
+import random
+import re
+import sys
+import time
+from types import MappingProxyType
+
+import click
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from classes.GogsDbReader import GogsDbReader  # noqa: E402
+
+
+def create_reader(users: int) -> GogsDbReader:
+	"""Creates a reader with a frozen mention table, as after `prepare_mentions`, without connecting to Gogs"""
+	reader = object.__new__(GogsDbReader)
+	reader.users = dict((f"user{i}", f"user{i}@example.com") for i in range(users))
+	# Every mentioned name is in the table, with None for names that are no Gogs user or have no Github account
+	reader.mentions = MappingProxyType(
+		dict((f"user{i}", f"github-user{i}" if i % 2 and i < users else None) for i in range(users * 2 + 1)))
+	reader.code_language = None
+	reader.allow_mentions = False
+	return reader
+
+
+def create_body(size: int, references: int, issues: int, users: int, rng: random.Random) -> str:
+	"""Creates a body of about `size` characters, with about `references` issue references and mentions"""
+	words = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit"]
+	parts, length = [], 0
+	reference_chance = references / max(1, size / 7)
+	while length < size:
+		if rng.random() < reference_chance:
+			word = f"#{rng.randint(1, issues)}" if rng.random() < 0.7 else f"@user{rng.randint(0, users * 2)}"
+		else:
+			word = rng.choice(words)
+		parts.append(word)
+		length += len(word) + 1
+	return " ".join(parts)
+
+
+def replace_references_before(reader: GogsDbReader, content: str, issue_map: {int: int}) -> str:
+	"""The implementation before the single-pass rewriter, with mentions from the frozen table"""
+	for match in re.findall(r'#(\d+)', content):
+		if int(match) in issue_map:
+			updated_reference = issue_map[int(match)]
+			if updated_reference is None:
+				updated_reference = "<not_migrated>"
+			content = content.replace(f'#{match}', f'#{updated_reference}')
+
+	for match in reader.mention_pattern.findall(content):
+		mention = reader.mentions.get(match.lower())
+		if mention is not None:
+			content = content.replace(f'@{match}', reader.format_user(match, mention))
+
+	return content
+
+
+def measure(function, bodies: [str], repeat: int) -> float:
+	""":return: Best time in seconds to rewrite all bodies"""
+	best = float("inf")
+	for _ in range(repeat):
+		start = time.perf_counter()
+		for body in bodies:
+			function(body)
+		best = min(best, time.perf_counter() - start)
+	return best
+
+
+@click.command()
+@click.option("--body-size", default=100_000, help="Number of characters in each body")
+@click.option("--references", default=5000, help="Number of issue references and mentions in each body")
+@click.option("--bodies", default=20, help="Number of bodies to rewrite")
+@click.option("--issues", default=5000, help="Number of issues in the issue map")
+@click.option("--users", default=200, help="Number of Gogs users that can be mentioned")
+@click.option("--repeat", default=3, help="Number of measurements, of which the best is reported")
+def benchmark(body_size, references, bodies, issues, users, repeat):
+	rng = random.Random(42)
+	reader = create_reader(users)
+	issue_map = dict((i, i + 100 if i % 10 else None) for i in range(1, issues + 1))
+	generated = [create_body(body_size, references, issues, users, rng) for _ in range(bodies)]
+	found = sum(len(GogsDbReader.reference_pattern.findall(body)) for body in generated)
+	megabytes = sum(len(body) for body in generated) / 1e6
+
+	click.echo(
+		f"{bodies} bodies of {body_size} characters, with {found / bodies:.0f} references and mentions per body")
+	for name, function in [
+		("before (str.replace per match)", lambda body: replace_references_before(reader, body, issue_map)),
+		("single pass (re.sub callback)", lambda body: reader.replace_references(body, issue_map))
+	]:
+		duration = measure(function, generated, repeat)
+		click.echo(
+			f"{name:32} {duration / bodies * 1000:9.2f} ms per body {megabytes / duration:9.2f} MB/s "
+			f"{found / duration:12.0f} references/s")
+
+
+if __name__ == "__main__":
+	benchmark()
@@ -0,0 +1,209 @@
+import asyncio
+import itertools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+	import httpx
+except ImportError:  # Only required for the async engine
+	httpx = None
+
+from classes.GithubAppApi import GithubAppApi
+
+
+class AsyncGithubAppApi(object):
+	"""
+	asyncio based client for the write operations of the Github API, with the same public methods as `GithubAppApi`.
+
+	Authentication, the user mapping, caches and rate limiters are shared with the blocking `GithubAppApi` this client
+	is created for, so both clients can be used side by side and draw from the same rate limit budget. The number of
+	requests in flight at the same time is bounded by `max_in_flight`.
+
+	The client has to be used as an async context manager, which opens and closes its connection pool
+	"""
+	logger = logging.getLogger(__name__)
+
+	def __init__(self, api: GithubAppApi, max_in_flight: int):
+		if httpx is None:
+			self.logger.critical(
+				"The async engine requires the httpx package. Install it with `pip install httpx`, or select the "
+				"`threads` engine in the configuration")
+			exit(7)
+
+		self.api = api
+		self.max_in_flight = max_in_flight
+		self.max_retries = api.conf.get_or_default(3, "github", "max_retries")
+		self.retry_backoff = api.conf.get_or_default(0.5, "github", "retry_backoff")
+		self.client = None
+		self.__in_flight = None
+		self.__lookup_lock = None
+		self.__turns = None
+
+	async def __aenter__(self):
+		limits = httpx.Limits(max_connections=self.max_in_flight, max_keepalive_connections=self.max_in_flight)
+		self.client = httpx.AsyncClient(base_url=self.api.base, limits=limits, timeout=60)
+		self.__in_flight = asyncio.Semaphore(self.max_in_flight)
+		self.__lookup_lock = asyncio.Lock()
+		self.__turns = dict()
+		return self
+
+	async def __aexit__(self, exc_type, exc_value, traceback):
+		await self.client.aclose()
+		self.client = None
+		for executor in self.__turns.values():
+			executor.shutdown()
+		self.__turns = None
+
+	async def create_issue(self, title: str, body: str, assignees: [str] or None, milestone: int, labels: [any]):
+		"""See `GithubAppApi.create_issue`"""
+		return await self.__write(self.api._create_issue_request(title, body, assignees, milestone, labels))
+
+	async def update_issue_state(
+			self, issue_number: int,
+			state: str or None,
+			labels: [any] or None,
+			assignees: [str] or None,
+			milestone: int or None,
+			body: str or None = None
+	) -> int:
+		"""See `GithubAppApi.update_issue_state`"""
+		return await self.__write(
+			self.api._update_issue_request(issue_number, state, labels, assignees, milestone, body))
+
+	async def create_issue_comment(self, issue_id: int, body: str):
+		"""See `GithubAppApi.create_issue_comment`"""
+		return await self.__write(self.api._create_issue_comment_request(issue_id, body))
+
+	async def try_create_pull_request(self, title: str, head: str, base: str, body: str):
+		"""See `GithubAppApi.try_create_pull_request`"""
+		return await self.__write(self.api._create_pull_request_request(title, head, base, body))
+
+	async def create_milestone(self, title: str, description: str, due_on: str, state: str = "open"):
+		"""See `GithubAppApi.create_milestone`"""
+		async with self.__lookup_lock:
+			milestone = await asyncio.get_running_loop().run_in_executor(
+				None, self.api._get_number_for_milestone_if_exists, title)
+
+		if milestone is not None:
+			self.logger.debug(f"Milestone {title} already exists on Github")
+			return milestone
+		else:
+			return await self.__write(self.api._create_milestone_request(title, description, due_on, state))
+
+	async def create_label_if_not_exists(self, name, color):
+		"""See `GithubAppApi.create_label_if_not_exists`"""
+		async with self.__lookup_lock:
+			label = await asyncio.get_running_loop().run_in_executor(None, self.api._label_exists, name)
+
+		if label is not None:
+			self.logger.debug(f"Label {name} already exists")
+			return label
+		else:
+			return await self.__write(self.api._create_label_request(name, color))
+
+	async def find_user_by_email(self, email: str):
+		"""
+		See `GithubAppApi.find_user_by_email`. Users that have not been found before are searched on a worker thread,
+		as the search API is paced far more strictly than requests can be made concurrently
+		"""
+		if email.lower() in self.api.users:
+			return self.api.users[email.lower()]
+		return await asyncio.get_running_loop().run_in_executor(None, self.api.find_user_by_email, email)
+
+	async def __wait_for_turn(self, budget: str, reserve) -> None:
+		"""
+		Waits for the turn of this repository in the fair queue of the budget shared with the other migrations, reserves
+		a slot in that turn, and then waits for the slot after passing the turn on. Turns are waited for on one thread
+		per budget, so the event loop is not blocked, and the requests of this client take their turns one by one, like
+		those of a single thread of the blocking client
+
+		:param budget:  Name of the budget, as passed to `GithubAppApi.get_fair_queue`
+		:param reserve: Function that reserves a slot, and returns the number of seconds until that slot
+		"""
+		fair_queue = self.api.get_fair_queue(budget)
+		if budget not in self.__turns:
+			self.__turns[budget] = ThreadPoolExecutor(max_workers=1)
+		acquired = asyncio.get_running_loop().run_in_executor(self.__turns[budget], fair_queue.acquire, self.api.repo)
+		try:
+			await asyncio.shield(acquired)
+		except asyncio.CancelledError:
+			# The turn is still handed to this client, and has to be passed on once it is
+			acquired.add_done_callback(lambda _: fair_queue.release(self.api.repo))
+			raise
+		wait = 0
+		try:
+			wait = reserve()
+		finally:
+			fair_queue.release(self.api.repo, wait)
+		await asyncio.sleep(wait)
+
+	async def __write(self, request: tuple):
+		"""
+		Sends a write request, and sends it again for as long as the blocking client says so after handling the response
+
+		:param request: Request built by one of the `_*_request` methods of `GithubAppApi`
+		:return:        Value of the response that the request was built for, or None if the request failed
+		"""
+		method, path, request_body = request[:3]
+		while True:
+			status, result = await self.__request(method, path, request_body)
+			retry, value = self.api._handle_write_result(status, result, request)
+			if not retry:
+				return value
+
+	async def __request(self, method: str, path: str, json: dict) -> (bool, dict):
+		"""
+		Sends a write request to Github, paced by the rate limiters shared with the blocking client. Like the session of
+		the blocking client, failed connections are retried for every request, and server errors only for requests that
+		can safely be repeated, with an exponentially growing delay. If Github cannot be reached, the request fails, so
+		the user can decide how to proceed
+
+		:param method:  HTTP method
+		:param path:    Path relative to the API base
+		:param json:    Request body
+		:return:        Tuple with first element success status and second element the response body
+		"""
+		if self.api.dry_run:
+			self.logger.debug(f"Not performing {method.upper()} request to Github because dry-run is enabled")
+			return True, self.api.mockup_request_result
+
+		if method == 'post':
+			# Every POST request made by this tool creates content, so is subject to the secondary rate limit
+			await self.__wait_for_turn('content', self.api.content_scheduler.reserve)
+
+		limiter = self.api.get_rate_limiter('core')
+		for attempt in itertools.count():
+			error = response = None
+			async with self.__in_flight:
+				await self.__wait_for_turn(limiter.resource, limiter.reserve)
+				headers = self.api.headers
+				try:
+					response = await self.client.request(method, path, json=json, headers=headers)
+				except httpx.TransportError as e:
+					error = e
+
+			repeatable = method != 'post' or isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout))
+			if error is not None or (repeatable and response.status_code in self.api.retry_statuses):
+				if not repeatable or attempt >= self.max_retries:
+					break
+				self.logger.debug(f"Request to {path} failed ({error or response.status_code}). Trying again")
+				await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+				continue
+
+			limiter.update(response.headers)
+			if response.status_code == 401:
+				await asyncio.get_running_loop().run_in_executor(
+					None, self.api.token_manager.refresh_after_unauthorized, headers)
+				if self.api.headers is not headers:
+					return await self.__request(method, path, json)
+
+			status, wait = self.api._verify_result(response)
+			if not status and wait >= 0:
+				await asyncio.sleep(wait)
+				return await self.__request(method, path, json)
+			else:
+				return status, response.json()
+
+		if error is not None:
+			return False, dict(message=f"Could not send request to Github: {error!r}")
+		return False, dict(message=f"Github responded with status {response.status_code}: {response.text}")
@@ -0,0 +1,114 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from classes.AsyncGithubAppApi import AsyncGithubAppApi
+from classes.Migrator import Migrator
+from classes.gogs_model.Issue import Issue
+
+
+class AsyncMigrator(Migrator):
+	"""
+	Migrator that sends the requests for labels, milestones and comments from an asyncio event loop, so hundreds of
+	requests can be in flight at the same time from a single thread.
+
+	Issues and pull requests are still created one after the other, as Github numbers them in order of creation.
+	Comments and state changes within a single issue are posted in their original order, while different issues are
+	handled concurrently
+	"""
+
+	def __create_client(self) -> AsyncGithubAppApi:
+		return AsyncGithubAppApi(self.api, self.configuration.get_or_default(100, "migration", "max_in_flight"))
+
+	def migrate_labels(self) -> None:
+		asyncio.run(self.__create_labels())
+
+	async def __create_labels(self):
+		async with self.__create_client() as api:
+			await asyncio.gather(
+				*(api.create_label_if_not_exists(label['name'], label['color']) for label in self.gogs.get_labels()))
+
+	def migrate_milestones(self) -> None:
+		asyncio.run(self.__create_milestones())
+
+	async def __create_milestones(self):
+		async with self.__create_client() as api:
+			milestones = [m for m in self.gogs.get_milestones() if m['id'] not in self.milestone_map]
+			numbers = await asyncio.gather(
+				*(api.create_milestone(m['name'], m['content'], m['deadline'], m['state']) for m in milestones))
+
+		for milestone, _id in zip(milestones, numbers):
+			self.milestone_map[milestone['id']] = _id
+			if _id is not None:
+				self.journal.record_mapping("milestone", milestone['id'], _id)
+			self.logger.debug(f"Milestone {milestone['id']} now has ID {_id} on Github")
+
+	def migrate_issue_comments(self) -> None:
+		asyncio.run(self.__post_all_comments())
+
+	async def __post_all_comments(self):
+		max_in_flight = self.configuration.get_or_default(100, "migration", "max_in_flight")
+		async with self.__create_client() as api:
+			with self.progressbar(length=self.count_migrated_issues(), label="Issues") as issues_bar:
+				in_flight = set()
+				async for issue, comments in self.__read_rendered_comments():
+					# Only the comments of issues that are being posted are kept in memory
+					if len(in_flight) >= max_in_flight:
+						done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+						for task in done:
+							task.result()
+						issues_bar.update(len(done))
+					in_flight.add(asyncio.ensure_future(self.__post_comments(api, issue, comments)))
+
+				for next_done in asyncio.as_completed(in_flight):
+					await next_done
+					issues_bar.update(1)
+
+	async def __read_rendered_comments(self):
+		"""
+		Reads, renders and resolves the users of the comments of each issue on a separate thread, as these block on the
+		Gogs database, the render stage and the user search, and would otherwise stall every request in flight
+
+		:return:    Asynchronous generator of the items of `get_rendered_comments`
+		"""
+		loop = asyncio.get_running_loop()
+		rendered = self.get_rendered_comments()
+		with ThreadPoolExecutor(max_workers=1) as reader:
+			try:
+				while True:
+					item = await loop.run_in_executor(reader, next, rendered, None)
+					if item is None:
+						return
+					yield item
+			finally:
+				await loop.run_in_executor(reader, rendered.close)
+
+	async def __post_comments(self, api: AsyncGithubAppApi, issue: Issue, comments: [(str, int, str)]):
+		issue_number = self.issue_map[issue.index]
+		self.logger.debug(
+			f"{len(comments)} comments rendered for issue/pull request #{issue.index} (-> #{issue_number})")
+
+		for key, comment_type, text in comments:
+			if key in self.posted:
+				self.logger.debug(f"Comment {key} was already posted in a previous run")
+			elif key in self.markers:
+				self.logger.debug(f"Comment {key} already exists on Github")
+				self.journal.record_posted(key, self.markers[key])
+			else:
+				comment_id = await api.create_issue_comment(issue_number, text)
+				if comment_id is not None:
+					self.journal.record_posted(key, comment_id)
+
+			if key + ":state" in self.posted:
+				continue
+			elif comment_type == 1:
+				# Issue (re)opened
+				self.logger.debug(f"Reopening #{issue.index} (-> #{issue_number})")
+				updated = await api.update_issue_state(issue_number, 'open', None, None, None)
+			elif comment_type == 2:
+				# Issue closed
+				self.logger.debug(f"Closing #{issue.index} (-> #{issue_number})")
+				updated = await api.update_issue_state(issue_number, 'closed', None, None, None)
+			else:
+				continue
+			if updated is not None:
+				self.journal.record_posted(key + ":state")
@@ -0,0 +1,153 @@
+import fnmatch
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from classes.AsyncMigrator import AsyncMigrator
+from classes.Configuration import Configuration
+from classes.GithubAppApi import GithubAppApi
+from classes.GogsDbReader import GogsDbReader
+from classes.Migrator import Migrator
+from classes.ResourceUsage import ResourceUsage
+
+
+class BatchMigrator(object):
+	"""
+	Migrates several Gogs repositories to Github repositories at the same time, as listed in the `batch` section of
+	the configuration.
+
+	All migrations share a single installation token and a single rate limit budget, as Github applies its limits to
+	the installation of the Github App rather than to a single repository. Running migrations take turns to reserve the
+	slots of each budget in a `FairQueue` of the shared API, so every running migration gets an equal share of every
+	budget, no matter how many threads it sends requests from, and a migration that waits for the content creation
+	budget does not hold up the requests of the others. Repositories are migrated from small to large, so most
+	repositories are finished early
+	"""
+	logger = logging.getLogger(__name__)
+
+	def __init__(
+			self, configuration: Configuration, import_users: str = None, export_users: str = None, resume: bool = False
+	):
+		self.configuration = configuration
+		self.import_users = import_users
+		self.export_users = export_users
+		self.resume = resume
+
+		self.password = GogsDbReader.prompt_password(configuration)
+		self.repositories = self.get_repository_pairs()
+		self.running = dict()
+		self.results = dict()
+		self.__lock = threading.Lock()
+		self.__finished = threading.Event()
+
+		if not len(self.repositories):
+			self.logger.critical("No Gogs repositories match the `batch` configuration")
+			exit(10)
+
+		self.start_migration()
+
+	def get_repository_pairs(self) -> [(int, str, str, int)]:
+		"""
+		Finds the repositories to migrate. These are the Gogs repositories listed in `repositories`, each with the name
+		of the Github repository to migrate it to, and all Gogs repositories of which the name matches `pattern`, which
+		are migrated to a Github repository with the same name. As Gogs repository names are only unique per owner,
+		repositories can be listed and matched as `owner/name`. Stops if several Gogs repositories would be migrated
+		to the same Github repository
+
+		:return:    List of tuples of the ID and `owner/name` of each Gogs repository, the name of the Github repository
+					to migrate it to, and the number of issues and pull requests in the Gogs repository, from small to
+					large
+		"""
+		listed = dict(
+			(gogs.lower(), github) for gogs, github in self.configuration.get_or_default([], "batch", "repositories"))
+		pattern = self.configuration.get_or_default(None, "batch", "pattern")
+
+		pairs, found = list(), set()
+		for repository in GogsDbReader.get_repositories(self.configuration, self.password):
+			name = f"{repository['owner']}/{repository['name']}"
+			matches = [gogs for gogs in listed if gogs in (name, repository["name"])]
+			if len(matches):
+				github = listed[matches[0]]
+				found.update(matches)
+			elif pattern and fnmatch.fnmatch(name if "/" in pattern else repository["name"], pattern.lower()):
+				github = repository["name"]
+			else:
+				continue
+			pairs.append((repository["id"], name, github, int(repository["size"] or 0)))
+
+		for gogs in listed:
+			if gogs not in found:
+				self.logger.warning(f"Gogs repository {gogs} was not found. Skipping")
+
+		targets = dict()
+		for _, gogs, github, _ in pairs:
+			targets.setdefault(github.lower(), []).append(gogs)
+		conflicts = [f"{', '.join(sources)} -> {github}" for github, sources in targets.items() if len(sources) > 1]
+		if len(conflicts):
+			self.logger.critical(
+				f"Several Gogs repositories would be migrated to the same Github repository ({'; '.join(conflicts)}). "
+				f"List each of them as `owner/name` in `repositories`, with its own Github repository")
+			exit(10)
+
+		return sorted(pairs, key=lambda pair: pair[3])
+
+	def start_migration(self):
+		gogs_id, _, github, _ = self.repositories[0]
+		self.logger.info(f"Migrating {len(self.repositories)} repositories")
+		shared_api = GithubAppApi(self.configuration.for_repository(gogs_id, github))
+		if self.import_users is not None:
+			shared_api.user_cache.import_file(self.import_users)
+
+		workers = max(1, self.configuration.get_or_default(4, "batch", "workers"))
+		monitor = threading.Thread(target=self.__report_status, daemon=True)
+		monitor.start()
+		with ThreadPoolExecutor(max_workers=workers) as executor:
+			for repository in self.repositories:
+				executor.submit(self.__migrate_repository, shared_api, *repository)
+		self.__finished.set()
+
+		if self.export_users is not None:
+			shared_api.user_cache.export_file(self.export_users)
+
+		failed = [name for name, result in self.results.items() if result is not None]
+		self.logger.info(
+			f"Migrated {len(self.results) - len(failed)} of {len(self.repositories)} repositories" +
+			(f". Failed: {', '.join(failed)}" if len(failed) else "") +
+			f". Peak RSS of all migrations together: {ResourceUsage.format_peak_rss()}")
+		shared_api.log_connection_statistics()
+		shared_api.token_manager.stop()
+
+	def __migrate_repository(self, shared_api: GithubAppApi, gogs_id: int, gogs: str, github: str, size: int):
+		name = f"{gogs} -> {github}"
+		start = time.perf_counter()
+		self.logger.info(f"Starting migration of {name} ({size} issues and pull requests)")
+		try:
+			engine = AsyncMigrator if self.configuration.get_or_default("threads", "migration", "engine") == "async" \
+				else Migrator
+			migrator = engine(
+				self.configuration.for_repository(gogs_id, github), resume=self.resume, shared_api=shared_api,
+				password=self.password, show_progress=False, start=False)
+			with self.__lock:
+				self.running[name] = migrator
+			migrator.start_migration()
+			result = None
+		except (Exception, SystemExit) as e:
+			self.logger.exception(f"Migration of {name} failed")
+			result = str(e) or type(e).__name__
+		with self.__lock:
+			self.running.pop(name, None)
+			self.results[name] = result
+		self.logger.info(
+			f"{'Finished' if result is None else 'Stopped'} migration of {name} in {time.perf_counter() - start:.0f}s "
+			f"({len(self.results)}/{len(self.repositories)} repositories done)")
+
+	def __report_status(self):
+		interval = self.configuration.get_or_default(60, "batch", "status_interval")
+		while not self.__finished.wait(interval):
+			with self.__lock:
+				status = [f"\t{name}: {migrator.get_status()}" for name, migrator in self.running.items()]
+			if len(status):
+				self.logger.info(
+					f"{len(self.results)}/{len(self.repositories)} repositories done. Peak RSS so far: "
+					f"{ResourceUsage.format_peak_rss()}. In progress:\n" + "\n".join(status))
@@ -1,3 +1,4 @@
+import copy
 import sys
 import toml
 
@@ -12,8 +13,24 @@ class Configuration(object):
 		self.conf = toml.load(configuration_file)
 
 		for parent, fields in self.required_fields.items():
+			if "batch" in self.conf:
+				# The repositories to migrate are listed in the batch section instead
+				fields = [field for field in fields if field != "repository"]
 			self.__verify_required_fields_present(parent, fields)
 
+	def for_repository(self, gogs_repository: str or int, github_repository: str):
+		"""
+		:param gogs_repository:     Name or ID of the Gogs repository
+		:param github_repository:   Name of the Github repository
+		:return:                    Copy of this configuration for migrating the given Gogs repository to the given
+									Github repository
+		"""
+		configuration = copy.copy(self)
+		configuration.conf = copy.deepcopy(self.conf)
+		configuration.conf["gogs"]["repository"] = gogs_repository
+		configuration.conf["github"]["repository"] = github_repository
+		return configuration
+
 	def __verify_required_fields_present(self, parent: str, fields: [str]) -> None:
 		if parent not in self.conf:
 			print(f"Specified configuration file has no `{parent}` configuration", file=sys.stderr)
@@ -0,0 +1,80 @@
+import logging
+import threading
+import time
+from collections import deque
+
+
+class ContentCreationScheduler(object):
+	"""
+	Schedules requests that create content on Github (issues, comments, pull requests, milestones and labels), which
+	are subject to a secondary rate limit on top of the primary rate limit.
+
+	Every window (e.g. 80 requests per minute, 500 requests per hour) is enforced as a sliding window over the times
+	at which requests were scheduled. On top of that, requests are spaced evenly at the highest rate that can be
+	sustained within all windows, so throughput stays just below the limit instead of alternating between bursts and
+	back-off periods.
+	"""
+	logger = logging.getLogger(__name__)
+
+	def __init__(self, windows: [(int, int)]):
+		"""
+		:param windows: List of tuples (maximum number of requests, window length in seconds)
+		"""
+		self.windows = [(limit, seconds) for limit, seconds in windows if limit > 0]
+		self.interval = max([seconds / limit for limit, seconds in self.windows], default=0)
+		self.longest_window = max([seconds for _, seconds in self.windows], default=0)
+		self.scheduled = deque()
+		self.__lock = threading.Lock()
+
+	def reserve(self) -> float:
+		"""
+		Schedules a content creation request at the earliest moment allowed by all windows
+
+		:return:    Number of seconds to wait before the request may be sent
+		"""
+		with self.__lock:
+			now = time.time()
+			while len(self.scheduled) and self.scheduled[0] <= now - self.longest_window:
+				self.scheduled.popleft()
+
+			at = now if not len(self.scheduled) else max(now, self.scheduled[-1] + self.interval)
+			moved = True
+			while moved:
+				moved = False
+				for limit, seconds in self.windows:
+					if self.__count_since(at - seconds) >= limit:
+						at = self.scheduled[-limit] + seconds
+						moved = True
+
+			self.scheduled.append(at)
+			return at - now
+
+	def acquire(self) -> None:
+		"""Waits until the next content creation request may be sent"""
+		self.wait(self.reserve())
+
+	def wait(self, wait: float) -> None:
+		"""Waits for a slot that was reserved with `reserve`"""
+		if wait > 0:
+			self.logger.debug(f"Waiting {wait:.1f} seconds before creating content. Window usage: {self.usage()}")
+			time.sleep(wait)
+
+	def usage(self) -> {int: (int, int)}:
+		"""
+		:return:    Dictionary mapping the length in seconds of every window to a tuple of the number of content
+					creation requests sent or scheduled in the window ending now, and the maximum for that window
+		"""
+		with self.__lock:
+			now = time.time()
+			return dict(
+				(seconds, (sum(1 for t in self.scheduled if now - seconds < t <= now), limit))
+				for limit, seconds in self.windows
+			)
+
+	def __count_since(self, start: float) -> int:
+		count = 0
+		for t in reversed(self.scheduled):
+			if t <= start:
+				break
+			count += 1
+		return count
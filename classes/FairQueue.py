@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import deque
+
+
+class FairQueue(object):
+	"""
+	Hands out the slots of one rate limit budget (e.g. the core API, or content creation) to the requests of several
+	migrations that share it, in round-robin order over the migrations that are waiting, instead of in the order in
+	which the requests are made.
+
+	Only one slot is reserved at a time, and the turn is passed on as soon as it is reserved, so the holder waits for
+	its slot outside the queue. A migration can only reserve its next slot once its previous slot has come, so a
+	migration that sends requests from many threads gets the same share of the budget as a migration that sends them
+	from one, and cannot reserve slots ahead of the others
+	"""
+
+	def __init__(self):
+		self.__condition = threading.Condition()
+		self.__waiting = dict()
+		self.__order = deque()
+		self.__due = dict()
+		self.__busy = False
+
+	def reserve(self, key: str, reserve) -> float:
+		"""
+		Reserves a slot in the turn of the migration with the given key
+
+		:param key:     Key of the migration the request is made for
+		:param reserve: Function that reserves a slot of the budget, and returns the number of seconds until that slot
+		:return:        Number of seconds to wait before the request may be sent
+		"""
+		self.acquire(key)
+		wait = 0
+		try:
+			wait = reserve()
+			return wait
+		finally:
+			self.release(key, wait)
+
+	def acquire(self, key: str) -> None:
+		"""
+		Waits until it is the turn of the migration with the given key. Waiting requests of the same migration are
+		served in the order in which they arrived
+
+		:param key: Key of the migration the request is made for
+		"""
+		ticket = object()
+		with self.__condition:
+			if key not in self.__waiting:
+				self.__waiting[key] = deque()
+				self.__order.append(key)
+			self.__waiting[key].append(ticket)
+
+			while True:
+				now = time.time()
+				# Migrations of which the previous slot has not come yet are passed over
+				ready = next((k for k in self.__order if self.__due.get(k, 0) <= now), None)
+				if not self.__busy and ready == key and self.__waiting[key][0] is ticket:
+					break
+				pending = [self.__due[k] for k in self.__order if self.__due.get(k, 0) > now]
+				self.__condition.wait(min(pending) - now if len(pending) else None)
+
+			self.__busy = True
+			self.__due.pop(key, None)
+			self.__waiting[key].popleft()
+			self.__order.remove(key)
+			if len(self.__waiting[key]):
+				# Other requests of this migration wait for their turn at the end of the round
+				self.__order.append(key)
+			else:
+				del self.__waiting[key]
+
+	def release(self, key: str, wait: float = 0) -> None:
+		"""
+		Passes the turn on to the next migration
+
+		:param key:     Key of the migration that held the turn
+		:param wait:    Number of seconds until the slot reserved in the turn
+		"""
+		with self.__condition:
+			self.__busy = False
+			if wait > 0:
+				self.__due[key] = time.time() + wait
+			self.__condition.notify_all()
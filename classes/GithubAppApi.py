@@ -1,13 +1,23 @@
+import json
 import logging
-import os
+import re
+import threading
 import time
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, quote, urlparse
 
 import click
 import requests
-from jose import jwt
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from classes.Configuration import Configuration
+from classes.ContentCreationScheduler import ContentCreationScheduler
+from classes.FairQueue import FairQueue
+from classes.RateLimiter import RateLimiter
+from classes.ResponseCache import ResponseCache
+from classes.TokenManager import TokenManager
+from classes.UserCache import UserCache
 
 
 class GithubAppApi(object):
@@ -15,24 +25,73 @@ class GithubAppApi(object):
 	base = "https://api.github.com/"
 	mockup_request_result = dict(number=42, id=1, name="Example Label", color="f29513")
 	continue_after_error = False
+	marker_pattern = re.compile(r'<!-- gogs-to-github:([\w:]+) -->')
 
-	def __init__(self, conf: Configuration):
-		self.users = dict()
+	# Server errors after which requests that can safely be repeated are sent again
+	retry_statuses = [500, 502, 503, 504]
+
+	# Only one thread at a time can ask the user how to proceed, even when several repositories are migrated at once
+	__prompt_lock = threading.Lock()
+
+	def __init__(self, conf: Configuration, shared: 'GithubAppApi' = None):
+		"""
+		:param conf:    Configuration of the migration
+		:param shared:  API for another repository of the same installation of the Github App. If given, its token, user
+						lookups, caches and rate limits are shared with this API, so that migrations to several
+						repositories together stay within the limits of the installation. The budget is shared fairly,
+						by letting each repository take its turn
+		"""
 		self.conf = conf
 		self.owner = self.conf.get("github", "username")
 		self.repo = self.conf.get("github", "repository")
 		self.app_id = self.conf.get("github", "app_id")
 		self.key_file = self.conf.get("github", "key_file")
-
 		self.create_pr = self.conf.get_or_default("migration", "pull_requests", "migrate")
-		self.jwt_token = self._get_jwt_token()
-		self._authenticate_app()
+
+		self.is_shared = shared is not None
+		if shared is None:
+			self.users = dict()
+			self.user_cache = UserCache(
+				self.conf.get_or_default("github-users.sqlite", "github", "user_cache"),
+				self.conf.get_or_default(30, "github", "user_cache_ttl_days") * 24 * 60 * 60,
+				self.conf.get_or_default(1, "github", "user_cache_negative_ttl_days") * 24 * 60 * 60
+			)
+			self.session = self._create_session()
+			self.token_manager = TokenManager(
+				self.app_id, self.key_file, self.session, self.base,
+				self.conf.get_or_default(5 * 60, "github", "token_refresh_margin"))
+			self._authenticate_app()
+			self.installation_repositories = self._get_installation_repositories()
+			response_cache = self.conf.get_or_default("github-responses.sqlite", "github", "response_cache")
+			self.response_cache = ResponseCache(response_cache) if response_cache else None
+			self.rate_limit_burst = self.conf.get_or_default(10, "migration", "rate_limit_burst")
+			self.rate_limiters = dict()
+			self.content_scheduler = ContentCreationScheduler([
+				(self.conf.get_or_default(75, "migration", "content_creation_per_minute"), 60),
+				(self.conf.get_or_default(480, "migration", "content_creation_per_hour"), 60 * 60)
+			])
+			self.fair_queues = dict()
+			self.__rate_limiters_lock = threading.Lock()
+		else:
+			self.users = shared.users
+			self.user_cache = shared.user_cache
+			self.session = shared.session
+			self.token_manager = shared.token_manager
+			self.installation_repositories = shared.installation_repositories
+			self.response_cache = shared.response_cache
+			self.rate_limit_burst = shared.rate_limit_burst
+			self.rate_limiters = shared.rate_limiters
+			self.content_scheduler = shared.content_scheduler
+			self.fair_queues = shared.fair_queues
+			self.__rate_limiters_lock = shared.__rate_limiters_lock
+
+		self._check_repository_access()
 		self.labels = None
 		self.milestones_by_title = None
-		self.consider_rate_limit = self.conf.get_or_default(False, "migration", "slow")
+		self.branches = dict()
 
-		self.__dry_run = self.conf.get_or_default(True, "migration", "dryrun")
-		if self.__dry_run:
+		self.dry_run = self.conf.get_or_default(True, "migration", "dryrun")
+		if self.dry_run:
 			self.logger.info("Dryrun instruction received, Not making changes on Github.")
 
 	def create_issue(self, title: str, body: str, assignees: [str] or None, milestone: int, labels: [any]):
@@ -46,34 +105,15 @@ class GithubAppApi(object):
 		:param labels:          Labels to associate with this issue.
 		:return:                Integer ID of the created issue
 		"""
-		request_body = dict(title=title)
-		for k, v in [("body", body), ("assignees", assignees), ("milestone", milestone), ("labels", labels)]:
-			if v is not None:
-				request_body[k] = v
-
-		status, result = self.__post(self.__get_repo_url('issues'), request_body)
-
-		if status:
-			self.logger.debug(f"Created issue {title}")
-			return result["number"]
-		else:
-			if 'errors' in result:
-				for e in result['errors']:
-					if 'field' in e and e['field'] == 'assignees' and 'value' in e:
-						assignees.remove(e['value'])
-						self.logger.debug(
-							f"{e['value']} is an invalid assignee according to Github. "
-							f"Trying again to create issue without assigning")
-						return self.create_issue(title, body, assignees, milestone, labels)
-			elif self.__print_error(f"Failed to create issue {title}", result):
-				return self.create_issue(title, body, assignees, milestone, labels)
+		return self._write(self._create_issue_request(title, body, assignees, milestone, labels))
 
 	def update_issue_state(
 			self, issue_number: int,
 			state: str or None,
 			labels: [any] or None,
 			assignees: [str] or None,
-			milestone: int or None
+			milestone: int or None,
+			body: str or None = None
 	) -> int:
 		"""
 		See https://docs.github.com/en/rest/reference/issues#update-an-issue
@@ -90,33 +130,11 @@ class GithubAppApi(object):
 								from the Issue. NOTE: Only users with push access can set assignees for new issues.
 								Assignees are silently dropped otherwise.
 		:param milestone:       undefined
+		:param body:            The contents of the issue.
 
-		:return:                None
+		:return:                Number of the updated issue, or None if it could not be updated
 		"""
-		request_body = dict()
-		if state is not None:
-			request_body['state'] = state
-		if labels is not None:
-			request_body['labels'] = labels
-		if assignees is not None:
-			request_body['assignees'] = assignees
-		if milestone is not None:
-			request_body['milestone'] = milestone
-
-		status, result = self.__patch(self.__get_repo_url(f'issues/{issue_number}'), request_body)
-		if status:
-			return result['number']
-		else:
-			if 'errors' in result:
-				for e in result['errors']:
-					if 'field' in e and e['field'] == 'assignees' and 'value' in e:
-						assignees.remove(e['value'])
-						self.logger.debug(
-							f"{e['value']} is an invalid assignee according to Github. "
-							f"Trying again to update issue without assigning")
-						return self.update_issue_state(issue_number, state, labels, assignees, milestone)
-			elif self.__print_error(f"Failed to update issue", result):
-				return self.update_issue_state(issue_number, state, labels, assignees, milestone)
+		return self._write(self._update_issue_request(issue_number, state, labels, assignees, milestone, body))
 
 	def create_issue_comment(self, issue_id: int, body: str):
 		"""
@@ -126,13 +144,7 @@ class GithubAppApi(object):
 		:param body:        Required. The contents of the comment.
 		:return:            Integer ID of the created comment
 		"""
-		status, result = self.__post(self.__get_repo_url(f'issues/{issue_id}/comments'), dict(body=body))
-		if status:
-			self.logger.debug("Successfully created issue comment")
-			return result['id']
-		else:
-			if self.__print_error("Failed to update issue", result):
-				return self.create_issue_comment(issue_id, body)
+		return self._write(self._create_issue_comment_request(issue_id, body))
 
 	def try_create_pull_request(self, title: str, head: str, base: str, body: str):
 		"""
@@ -149,19 +161,7 @@ class GithubAppApi(object):
 		:param body:    The contents of the pull request.
 		:return:        Integer pull request number of the created pull request
 		"""
-		request_body = dict(title=title, head=head, base=base)
-
-		if body is not None:
-			request_body['body'] = body
-
-		status, result = self.__post(self.__get_repo_url('pulls'), request_body)
-		if status:
-			self.logger.debug("Successfully created pull request")
-			return result['number']
-		else:
-			# We were never sure if we could create this as a PR to begin with
-			self.logger.debug("Tried creating pull request, but head or base branch seem to be missing")
-			return None
+		return self._write(self._create_pull_request_request(title, head, base, body))
 
 	def create_milestone(self, title: str, description: str, due_on: str, state: str = "open"):
 		"""
@@ -174,27 +174,100 @@ class GithubAppApi(object):
 		:return:            Integer ID of the created milestone
 		"""
 
-		milestone = self.__get_number_for_milestone_if_exists(title)
+		milestone = self._get_number_for_milestone_if_exists(title)
 		if milestone is not None:
 			self.logger.debug(f"Milestone {title} already exists on Github")
 			return milestone
 		else:
-			request_body = dict(title=title)
-			for k, v in [("description", description), ("due_on", due_on), ("state", state)]:
-				if v is not None:
-					request_body[k] = v
+			return self._write(self._create_milestone_request(title, description, due_on, state))
+
+	def _create_issue_request(self, title, body, assignees, milestone, labels) -> tuple:
+		return (
+			'post', self._get_repo_url('issues'),
+			self._request_body(title=title, body=body, assignees=assignees, milestone=milestone, labels=labels),
+			'number', f"Failed to create issue {title}", f"Created issue {title}")
+
+	def _update_issue_request(self, issue_number, state, labels, assignees, milestone, body) -> tuple:
+		return (
+			'patch', self._get_repo_url(f'issues/{issue_number}'),
+			self._request_body(body=body, state=state, labels=labels, assignees=assignees, milestone=milestone),
+			'number', f"Failed to update issue {issue_number}", f"Updated issue {issue_number}")
+
+	def _create_issue_comment_request(self, issue_id, body) -> tuple:
+		return (
+			'post', self._get_repo_url(f'issues/{issue_id}/comments'), dict(body=body),
+			'id', f"Failed to create comment on issue {issue_id}", "Successfully created issue comment")
+
+	def _create_pull_request_request(self, title, head, base, body) -> tuple:
+		# We were never sure if we could create this as a PR to begin with, so failing is not an error
+		return (
+			'post', self._get_repo_url('pulls'), self._request_body(title=title, head=head, base=base, body=body),
+			'number', None, "Successfully created pull request")
+
+	def _create_milestone_request(self, title, description, due_on, state) -> tuple:
+		return (
+			'post', self._get_repo_url('milestones'),
+			self._request_body(title=title, description=description, due_on=due_on, state=state),
+			'number', f"Failed to create milestone {title}", f"Created milestone {title}")
+
+	def _create_label_request(self, name, color) -> tuple:
+		return (
+			'post', self._get_repo_url('labels'),
+			self._request_body(name=name, color=color.replace('#', '') if color is not None else None),
+			None, f"Failed to create label {name} and the label did not yet exist", f"Created label {name}")
 
-			status, result = self.__post(self.__get_repo_url('milestones'), request_body)
-			if status:
-				self.logger.debug(f"Created milestone {title}")
-				return result['number']
-			else:
-				if self.__print_error(f"Failed to create milestone {title}", result):
-					return self.create_milestone(title, description, due_on, state)
+	@staticmethod
+	def _request_body(**fields) -> dict:
+		return dict((k, v) for k, v in fields.items() if v is not None)
+
+	def _write(self, request: tuple):
+		"""
+		Sends a write request, and sends it again for as long as `_handle_write_result` says so
+
+		:param request: Request built by one of the `_*_request` methods
+		:return:        Value of the response that the request was built for, or None if the request failed
+		"""
+		method, path, request_body = request[:3]
+		while True:
+			status, result = self.__post(path, request_body) if method == 'post' else self.__patch(path, request_body)
+			retry, value = self._handle_write_result(status, result, request)
+			if not retry:
+				return value
+
+	def _handle_write_result(self, status: bool, result: dict, request: tuple) -> (bool, any):
+		"""
+		Handles the response to a write request, for both the blocking and the async client. Assignees Github rejects
+		are removed from the request, after which it is sent again. Other errors are reported to the user, who decides
+		whether to try again
+
+		:param status:  True iff the request succeeded
+		:param result:  Response body
+		:param request: Tuple of the method, path and body of the request, the field of the response to return (or
+						None for the whole response), the message to report if the request fails (or None if failing is
+						expected), and the message to log if it succeeds
+		:return:        Tuple of whether the request should be sent again, and the value to return for the request
+		"""
+		_, _, request_body, field, error, success = request
+		if status:
+			self.logger.debug(success)
+			return False, result if field is None else result[field]
+		elif 'errors' in result and 'assignees' in request_body:
+			for e in result['errors']:
+				if 'field' in e and e['field'] == 'assignees' and 'value' in e:
+					request_body['assignees'].remove(e['value'])
+					self.logger.debug(
+						f"{e['value']} is an invalid assignee according to Github. Trying again without assigning")
+					return True, None
+			return False, None
+		elif error is None:
+			self.logger.debug(f"Request to {request[1]} failed: {result}")
+			return False, None
+		else:
+			return bool(self._print_error(error, result)), None
 
-	def __get_number_for_milestone_if_exists(self, title: str):
+	def _get_number_for_milestone_if_exists(self, title: str):
 		if self.milestones_by_title is None:
-			status, milestones = self.__get(self.__get_repo_url('milestones'), dict(state='all'))
+			status, milestones = self.__get(self._get_repo_url('milestones'), dict(state='all'))
 
 			if status:
 				self.logger.debug("Milestones loaded from Github")
@@ -220,25 +293,15 @@ class GithubAppApi(object):
 			self.logger.debug(f"Label {name} already exists")
 			return label
 		else:
-			request_body = dict(name=name)
-			if color is not None:
-				request_body["color"] = color.replace('#', '')
-
-			status, result = self.__post(self.__get_repo_url('labels'), request_body)
-			if status:
-				self.logger.debug(f"Created label {name}")
-				return result
-			else:
-				if self.__print_error(f"Failed to create label {name} and the label did not yet exist", result):
-					return self.create_label_if_not_exists(name, color)
+			return self._write(self._create_label_request(name, color))
 
 	def _label_exists(self, label_name: str):
 		if self.labels is None:
-			status, result = self.__get(self.__get_repo_url('labels'))
+			status, result = self.__get(self._get_repo_url('labels'))
 			if status:
 				self.labels = result
 			else:
-				if self.__print_error("Could not retrieve labels", result):
+				if self._print_error("Could not retrieve labels", result):
 					return self._label_exists(label_name)
 				return None
 
@@ -248,8 +311,35 @@ class GithubAppApi(object):
 
 		return None
 
+	def get_next_issue_number(self) -> int or None:
+		"""
+		Github numbers the issues and pull requests of a repository in a single sequence, in order of creation.
+
+		:return:    The number the next issue or pull request will get, assuming no issues were deleted or transferred,
+					or None if it could not be determined
+		"""
+		status, result = self.__get(
+			self._get_repo_url('issues'), dict(state='all', sort='created', direction='desc', per_page=1))
+		if not status:
+			self._print_error("Could not determine the number of the next issue", result)
+			return None
+
+		return result[0]['number'] + 1 if len(result) else 1
+
+	def branch_exists(self, branch: str) -> bool:
+		"""
+		See https://docs.github.com/en/rest/reference/repos#get-a-branch
+
+		:param branch:  Name of the branch
+		:return:        True iff the branch exists on the Github repository
+		"""
+		if branch not in self.branches:
+			status, _ = self.__get_response(self._get_repo_url(f'branches/{quote(branch)}'))
+			self.branches[branch] = status
+		return self.branches[branch]
+
 	def __get_contributors(self):
-		status, result = self.__get(self.__get_repo_url('contributors'))
+		status, result = self.__get(self._get_repo_url('contributors'))
 		if status:
 			return dict([(result['email'], result['login']) for user in result if 'email' in user])
 		return dict()
@@ -258,86 +348,261 @@ class GithubAppApi(object):
 		email = email.lower()
 		status, result = self.__get('search/users', dict(q=email))
 		if status:
-			users = result['items']
-			for user in users:
-				user_json = requests.get(user['url'], headers=self.headers).json()
-				if user_json['email'] is not None and user_json['email'].lower() == email:
-					self.logger.debug(f"Found Github user {user['login']} for e-mail address {email}")
-					return user['login']
+			for login, public_email in self.__get_public_emails([user['login'] for user in result['items']]).items():
+				if public_email is not None and public_email.lower() == email:
+					self.logger.debug(f"Found Github user {login} for e-mail address {email}")
+					return login
 
 		self.logger.debug(f"No Github user found for e-mail address {email}")
 		return None
 
+	def __get_public_emails(self, logins: [str]) -> {str: str or None}:
+		"""
+		Retrieves the public e-mail addresses of a number of Github users in a single GraphQL query, instead of
+		requesting the profile of every user separately
+
+		:param logins:  Logins of the Github users
+		:return:        Dictionary mapping the logins to the public e-mail address of that user, or None
+		"""
+		if not len(logins):
+			return dict()
+
+		query = "query { " + " ".join(
+			f"u{i}: user(login: {json.dumps(login)}) {{ login email }}" for i, login in enumerate(logins)) + " }"
+		response = self.__send('post', 'graphql', json=dict(query=query))
+		result = response.json() if response.status_code == 200 else dict()
+
+		if result.get('data') is None:
+			self.logger.debug(f"Could not query e-mail addresses of {logins} in bulk. Requesting profiles one by one")
+			emails = dict()
+			for login in logins:
+				status, user_json = self.__get(f'users/{login}')
+				emails[login] = user_json['email'] if status else None
+			return emails
+
+		return dict(
+			(user['login'], user['email'] or None) for user in result['data'].values() if user is not None)
+
+	def find_users_by_email(self, emails: [str]) -> {str: str or None}:
+		"""
+		Finds the Github users for a number of e-mail addresses at the same time. Searches are performed in parallel by
+		`user_search_workers` threads, and are paced by the rate limiter of the search API
+
+		:param emails:  E-mail addresses to find Github users for
+		:return:        Dictionary mapping the (lower case) e-mail addresses to the Github login found for that address,
+						or None
+		"""
+		emails = list(dict.fromkeys(email.lower() for email in emails if email is not None))
+		workers = self.conf.get_or_default(4, "github", "user_search_workers")
+		with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+			return dict(zip(emails, executor.map(self.find_user_by_email, emails)))
+
 	def find_user_by_email(self, email: str):
 		email = email.lower()
 		if email in self.users:
 			return self.users[email]
+
+		found, user = self.user_cache.get(email)
+		if found:
+			self.logger.debug(f"Using cached Github user {user} for e-mail address {email}")
 		else:
-			# Intentionally set e-mail to None in dict, to avoid further requests for this e-mail
 			user = self.__find_user_by_email(email)
-			self.users[email] = user
-			return user
+			self.user_cache.put(email, user)
 
-	def __get_repo_url(self, path):
+		# Intentionally set e-mail to None in dict, to avoid further requests for this e-mail
+		self.users[email] = user
+		return user
+
+	def _get_repo_url(self, path):
 		return f'repos/{self.owner}/{self.repo}/{path}'
 
 	def __post(self, path, request_body):
-		if self.__dry_run:
+		if self.dry_run:
 			self.logger.debug("Not performing POST request to Github because dry-run is enabled")
 			return True, self.mockup_request_result
 
-		result = requests.post(
-			self.base + path,
-			json=request_body,
-			headers=self.headers
-		)
+		# Every POST request made by this tool creates content, so is subject to the secondary rate limit
+		self.content_scheduler.wait(self.get_fair_queue('content').reserve(self.repo, self.content_scheduler.reserve))
+		result = self.__send('post', path, json=request_body)
 
-		status, wait = self.__verify_result(result)
+		status, wait = self._verify_result(result)
 		if not status and wait >= 0:
 			time.sleep(wait)
-			self.__post(path, request_body)
+			return self.__post(path, request_body)
 		else:
-			if self.consider_rate_limit:
-				time.sleep(1)
 			return status, result.json()
 
 	def __patch(self, path, request_body):
-		if self.__dry_run:
+		if self.dry_run:
 			self.logger.debug("Not performing PATCH request to Github because dry-run is enabled")
 			return True, self.mockup_request_result
 
-		result = requests.patch(
-			self.base + path,
-			json=request_body,
-			headers=self.headers
-		)
+		result = self.__send('patch', path, json=request_body)
 
-		status, wait = self.__verify_result(result)
+		status, wait = self._verify_result(result)
 		if not status and wait >= 0:
 			time.sleep(wait)
-			self.__patch(path, request_body)
+			return self.__patch(path, request_body)
 		else:
-			if self.consider_rate_limit:
-				time.sleep(1)
 			return status, result.json()
 
 	def __get(self, path, params=None):
+		status, result = self.__get_response(path, params)
+		return status, result.json()
+
+	def __get_response(self, path, params=None) -> (bool, requests.Response):
 		use_params = dict() if params is None else params
 
-		result = requests.get(
-			self.base + path,
-			params=use_params,
-			headers=self.headers
-		)
+		if self.response_cache is None:
+			result = self.__send('get', path, params=use_params)
+		else:
+			result = self.__send_conditional_get(path, use_params)
 
-		status, wait = self.__verify_result(result)
+		status, wait = self._verify_result(result)
 		if not status and wait >= 0:
 			time.sleep(wait)
-			self.__get(path, params)
+			return self.__get_response(path, params)
 		else:
-			return status, result.json()
+			return status, result
+
+	def __get_all_pages(self, path: str, params: dict = None) -> list:
+		"""
+		Retrieves all pages of a paginated list. The first page is requested to find out how many pages there are,
+		after which all other pages are requested in parallel by `scan_workers` threads
+
+		:param path:    Path of the list, relative to the API base
+		:param params:  Additional query parameters
+		:return:        Concatenation of all pages
+		"""
+		params = dict() if params is None else params
+		status, response = self.__get_response(path, dict(params, per_page=100, page=1))
+		if not status:
+			self._print_error(f"Could not retrieve {path}", response.json())
+			return []
+
+		last_page = 1
+		if 'last' in response.links:
+			last_page = int(parse_qs(urlparse(response.links['last']['url']).query)['page'][0])
+
+		def get_page(page):
+			page_status, page_result = self.__get(path, dict(params, per_page=100, page=page))
+			return page_result if page_status else []
+
+		items = response.json()
+		workers = self.conf.get_or_default(4, "github", "scan_workers")
+		with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+			for page in executor.map(get_page, range(2, last_page + 1)):
+				items += page
+
+		return items
+
+	def get_migration_markers(self) -> {str: int}:
+		"""
+		Scans all issues, pull requests and comments on the Github repository for the hidden markers added by
+		`add_migration_marker`, to find out which Gogs items have already been migrated
+
+		:return:    Dictionary mapping the marker keys to the number of the issue or pull request, or the ID of the
+					comment that carries the marker
+		"""
+		markers = dict()
+		for issue in self.__get_all_pages(self._get_repo_url('issues'), dict(state='all')):
+			for key in self.marker_pattern.findall(issue.get('body') or ""):
+				markers[key] = issue['number']
+		for comment in self.__get_all_pages(self._get_repo_url('issues/comments')):
+			for key in self.marker_pattern.findall(comment.get('body') or ""):
+				markers[key] = comment['id']
+
+		self.logger.debug(f"Found {len(markers)} items on Github that were migrated before")
+		return markers
+
+	@staticmethod
+	def add_migration_marker(body: str, key: str) -> str:
+		"""
+		Adds a hidden marker to the body of an issue, pull request or comment, by which the migrated item can be
+		recognized in later runs
+
+		:param body:    Body to add the marker to
+		:param key:     Unique key of the migrated Gogs item
+		"""
+		return f"{body}\n\n<!-- gogs-to-github:{key} -->"
+
+	def __send_conditional_get(self, path: str, params: dict) -> requests.Response:
+		"""
+		Sends a GET request with the validators of a previously cached response for the same URL and parameters. If
+		Github reports the resource has not been modified, the response is completed with the cached body
+		"""
+		key = ResponseCache.key(path, params)
+		result = self.__send('get', path, params=params, headers=self.response_cache.get_validators(key))
+
+		if result.status_code == 304:
+			cached = self.response_cache.get(key)
+			if cached is not None:
+				self.logger.debug(f"Serving {path} from cache, as it was not modified")
+				result.status_code = 200
+				result._content = cached[0]
+				if cached[1] is not None:
+					result.headers['Link'] = cached[1]
+		elif result.status_code == 200:
+			self.response_cache.put(key, result.headers, result.content)
+
+		return result
+
+	def __send(self, method: str, path: str, **kwargs) -> requests.Response:
+		"""
+		Sends a request to the Github API, paced by the rate limiter of the API resource the request is counted against.
+		Slots of the rate limiter are reserved in the turn of this repository, so repositories that are migrated at the
+		same time share the budget fairly
+
+		:param method:  HTTP method
+		:param path:    Path relative to the API base, or a full URL to the API
+		:param kwargs:  Additional arguments for `requests.Session.request`
+		:return:        Response from Github
+		"""
+		url = path if path.startswith(self.base) else self.base + path
+		if url.startswith(self.base + 'search/'):
+			limiter = self.get_rate_limiter('search')
+		elif url.startswith(self.base + 'graphql'):
+			limiter = self.get_rate_limiter('graphql')
+		else:
+			limiter = self.get_rate_limiter('core')
+
+		extra_headers = kwargs.pop('headers', dict())
+		headers = dict(self.headers, **extra_headers)
+		limiter.wait(self.get_fair_queue(limiter.resource).reserve(self.repo, limiter.reserve))
+		response = self.session.request(method, url, headers=headers, **kwargs)
+		limiter.update(response.headers)
+
+		if response.status_code == 401:
+			self.token_manager.refresh_after_unauthorized(headers)
+			headers = dict(self.headers, **extra_headers)
+			limiter.wait(self.get_fair_queue(limiter.resource).reserve(self.repo, limiter.reserve))
+			response = self.session.request(method, url, headers=headers, **kwargs)
+			limiter.update(response.headers)
+
+		return response
+
+	@property
+	def headers(self) -> dict:
+		"""Headers to authenticate as the installation of the Github App, which are kept valid by the token manager"""
+		return self.token_manager.headers
+
+	def get_rate_limiter(self, resource: str) -> RateLimiter:
+		with self.__rate_limiters_lock:
+			if resource not in self.rate_limiters:
+				self.rate_limiters[resource] = RateLimiter(resource, self.rate_limit_burst)
+			return self.rate_limiters[resource]
+
+	def get_fair_queue(self, budget: str) -> FairQueue:
+		"""
+		:param budget:  Name of the rate limited resource, or `content` for the secondary rate limit on content creation
+		:return:        Queue in which the repositories sharing the budget take turns to reserve its slots
+		"""
+		with self.__rate_limiters_lock:
+			if budget not in self.fair_queues:
+				self.fair_queues[budget] = FairQueue()
+			return self.fair_queues[budget]
 
-	def __verify_result(self, response: requests.Response) -> (bool, int):
+	def _verify_result(self, response: requests.Response) -> (bool, int):
 		"""
 		Checks if the response yielded a success code. If not, checks if a rate limit suggestion is provided. If
 		neither is the case, assume an error
@@ -350,15 +615,24 @@ class GithubAppApi(object):
 		else:
 			if 'Retry-After' in response.headers:
 				self.logger.debug(f"Reached API rate limit. Trying again in {response.headers['Retry-After']} seconds")
-				return False, response.headers['Retry-After']
+				return False, int(response.headers['Retry-After'])
+			elif response.status_code in [403, 429] and response.headers.get('X-RateLimit-Remaining') == '0':
+				wait = max(0, int(response.headers['X-RateLimit-Reset']) - int(time.time())) + 1
+				self.logger.debug(f"Rate limit exhausted. Trying again in {wait} seconds, when the limit is reset")
+				return False, wait
 			else:
-				self.logger.debug(f"Got response code {response.status_code}: {response.raw}")
+				self.logger.debug(f"Got response code {response.status_code}: {response.text}")
 				return False, -1
 
-	def __print_error(self, msg: str, response: dict):
+	def _print_error(self, msg: str, response: dict):
 		for k in response:
 			msg += f"\n\t{k}: {response[k]}"
 
+		# Only one thread at a time can ask the user how to proceed
+		with self.__prompt_lock:
+			return self.__prompt_after_error(msg)
+
+	def __prompt_after_error(self, msg: str):
 		if self.continue_after_error:
 			self.logger.debug(msg)
 		else:
@@ -377,21 +651,50 @@ class GithubAppApi(object):
 			else:
 				exit(0)
 
+	def _create_session(self) -> requests.Session:
+		"""
+		Creates the HTTP session used for all calls to the Github API, which keeps connections to the API alive and
+		reuses them between requests, instead of setting up a new TCP and TLS connection for every request
+		"""
+		pool_size = self.conf.get_or_default(10, "github", "connection_pool_size")
+		retry = Retry(
+			total=self.conf.get_or_default(3, "github", "max_retries"),
+			backoff_factor=self.conf.get_or_default(0.5, "github", "retry_backoff"),
+			# Only retry server errors on requests that can safely be repeated. Connection errors are retried for
+			# every request, as the request never reached Github
+			status_forcelist=self.retry_statuses,
+			allowed_methods=frozenset(["GET", "PATCH"]),
+			raise_on_status=False
+		)
+		session = requests.Session()
+		session.mount(self.base, HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry))
+		return session
+
+	def log_connection_statistics(self) -> None:
+		"""Logs how many requests were made to the Github API, and over how many connections"""
+		pools = self.session.get_adapter(self.base).poolmanager.pools
+		connections = sum(pools[key].num_connections for key in pools.keys())
+		made_requests = sum(pools[key].num_requests for key in pools.keys())
+		reuse = 1 - connections / made_requests if made_requests else 0
+		self.logger.info(
+			f"Made {made_requests} requests to Github over {connections} connections "
+			f"(connection reuse ratio {reuse:.1%})")
+
 	@staticmethod
 	def _create_default_headers(auth: str):
-		return {'Accept': 'application/vnd.github.v3+json', 'Authorization': auth}
+		return TokenManager.create_default_headers(auth)
 
 	@staticmethod
 	def _create_token_headers(token):
-		return GithubAppApi._create_default_headers(f'Token {token}')
+		return TokenManager.create_token_headers(token)
 
 	@staticmethod
 	def _create_jwt_headers(jwt_token):
-		return GithubAppApi._create_default_headers(f'Bearer {jwt_token}')
+		return TokenManager.create_jwt_headers(jwt_token)
 
 	def _authenticate_app(self):
-		jwt_headers = self._create_jwt_headers(self.jwt_token)
-		result = requests.get(self.base + 'app/installations', headers=jwt_headers).json()
+		jwt_headers = self._create_jwt_headers(self.token_manager.create_jwt())
+		result = self.session.get(self.base + 'app/installations', headers=jwt_headers).json()
 		if 'message' in result:
 			self.logger.critical(f"Github returned the following message: {result['message']}.")
 			self.logger.critical("Please check the provided Github App ID and private key file")
@@ -403,10 +706,10 @@ class GithubAppApi(object):
 		application_id = result[0]["id"]
 
 		# Activate installation
-		requests.get(self.base + f'app/installations/{application_id}', headers=jwt_headers)
+		self.session.get(self.base + f'app/installations/{application_id}', headers=jwt_headers)
 
 		# Get Authorization token for installation
-		token_result = requests.post(
+		token_result = self.session.post(
 			self.base + f'app/installations/{application_id}/access_tokens', headers=jwt_headers).json()
 
 		if "issues" not in token_result["permissions"] or token_result["permissions"]["issues"] != 'write':
@@ -432,30 +735,25 @@ class GithubAppApi(object):
 				if response == 'n':
 					exit(0)
 
-		self.token = token_result['token']
-		self.headers = self._create_token_headers(self.token)
-
-		for r in result:
-			repositories = requests.get(r['repositories_url'], headers=self.headers).json()
-			for repo in repositories['repositories']:
-				if self.repo == repo['name'].lower():
-					# All is good
-					return
-
-		self.logger.critical(f"Your github app is not installed yet, or does not have access to the repository {self.repo}")
-		exit(6)
-
-	def _get_jwt_token(self):
-		if not os.path.exists(self.key_file):
-			self.logger.critical(f"Key file {self.key_file} does not exist")
-			exit(5)
-		with open(self.key_file, 'r') as key_file_in:
-			private_pem = key_file_in.read()
-
-		payload = {
-			"iat": int(datetime.timestamp(datetime.now())),
-			"exp": int(datetime.timestamp(datetime.now())) + (9 * 60),
-			"iss": self.app_id
-		}
-		self.logger.debug(f"Generating JWT code for Github app {self.app_id} to access Github API")
-		return jwt.encode(payload, private_pem, algorithm="RS256")
+		self.token_manager.set_installation_token(application_id, token_result)
+
+	def _get_installation_repositories(self) -> {str}:
+		"""
+		See https://docs.github.com/en/rest/reference/apps#list-repositories-accessible-to-the-app-installation
+
+		:return:    Lower case names of all repositories the installation of the Github App has access to
+		"""
+		repositories, page = set(), 1
+		while True:
+			result = self.session.get(
+				self.base + 'installation/repositories', headers=self.headers, params=dict(per_page=100, page=page)).json()
+			repositories.update(repo['name'].lower() for repo in result.get('repositories', []))
+			if len(result.get('repositories', [])) < 100:
+				return repositories
+			page += 1
+
+	def _check_repository_access(self):
+		if self.repo.lower() not in self.installation_repositories:
+			self.logger.critical(
+				f"Your github app is not installed yet, or does not have access to the repository {self.repo}")
+			exit(6)
@@ -1,53 +1,201 @@
+import itertools
 import os
+import queue
 import re
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from types import MappingProxyType
 import logging
 
 import click
 import mysql.connector
 from mysql.connector import Error, ProgrammingError
+from mysql.connector.pooling import MySQLConnectionPool
 
 from classes.Configuration import Configuration
 from classes.GithubAppApi import GithubAppApi
+from classes.ResourceUsage import ResourceUsage
 
 
 class GogsDbReader(object):
 	logger = logging.getLogger(__name__)
+	mention_pattern = re.compile(r'@([\w.\d]+)')
 
-	def __init__(self, api: GithubAppApi, configuration: Configuration):
+	# Issue references and @mentions, matched in a single pass, so a reference is never rewritten inside another one
+	reference_pattern = re.compile(r'#(\d+)|@([\w.\d]+)')
+
+	# Opening or closing line of a fenced codeblock
+	fence_pattern = re.compile(r' {0,3}(`{3,}|~{3,})')
+
+	# Tables read during the migration, which are locked briefly to start the snapshots of all parallel readers at the
+	# same point in time
+	snapshot_tables = ["issue", "comment", "label", "issue_label", "milestone", "pull_request", "user"]
+
+	# Named queries, which are prepared once per connection and executed with bound parameters
+	statements = dict(
+		users='SELECT distinct name, lower_name, email FROM `user`',
+		repository_id='SELECT `id` FROM `repository` WHERE `lower_name` = %s',
+		labels='SELECT id, name, color FROM `label` WHERE repo_id = %s',
+		milestones='''
+			SELECT id,name, content, is_closed, deadline_unix as deadline, closed_date_unix as closed_date 
+			FROM `milestone` 
+			WHERE milestone.repo_id = %s 
+			ORDER BY id asc
+			''',
+		issues='''
+			SELECT issue.id, issue.index, issue.name, issue.content, issue.milestone_id, issue.is_closed,
+			issue.is_pull, issue.deadline_unix, issue.created_unix, issue.updated_unix,
+			creator.name as creator, assigned.name as assignee
+			FROM issue
+			LEFT JOIN user creator on issue.poster_id=creator.id
+			LEFT JOIN user assigned on issue.assignee_id=assigned.id
+			WHERE issue.repo_id = %s
+			ORDER BY issue.created_unix asc, issue.id asc
+			''',
+		comments='''
+			SELECT comment.id, comment.issue_id, comment.type, comment.content, comment.commit_sha, 
+			comment.created_unix, comment.updated_unix, user.name, user.email
+			FROM comment 
+			INNER JOIN issue on comment.issue_id=issue.id 
+			LEFT JOIN user on comment.poster_id=user.id 
+			WHERE issue.repo_id = %s 
+			ORDER BY issue.created_unix asc, issue.id asc, comment.created_unix asc, comment.id asc
+			''',
+		# The placeholders for the issue IDs are filled in for `comment_batch_size` issues when the reader is created
+		comments_for_issues='''
+			SELECT comment.id, comment.issue_id, comment.type, comment.content, comment.commit_sha, 
+			comment.created_unix, comment.updated_unix, user.name, user.email
+			FROM comment 
+			LEFT JOIN user on comment.poster_id=user.id 
+			WHERE comment.issue_id IN ({issue_ids}) 
+			ORDER BY comment.issue_id asc, comment.created_unix asc, comment.id asc
+			''',
+		issue_labels='''
+			SELECT distinct issue_label.issue_id, label.id, label.name, label.color 
+			FROM `issue_label` 
+			INNER JOIN label on label.id = issue_label.label_id 
+			INNER JOIN issue on issue.id = issue_label.issue_id 
+			WHERE issue.repo_id = %s
+			''',
+		pull_requests='''
+			SELECT 
+				pull_request.id, pull_request.issue_id, pull_request.type, pull_request.head_branch, 
+				pull_request.base_branch, pull_request.has_merged, pull_request.merge_base, 
+				pull_request.merged_commit_id, pull_request.merged_unix, user.name 
+			FROM pull_request 
+			INNER JOIN issue ON pull_request.issue_id=issue.id 
+			LEFT JOIN user ON pull_request.merger_id=user.id 
+			WHERE issue.repo_id = %s 
+			''',
+		repositories='''
+			SELECT repository.id, owner.lower_name AS owner, repository.lower_name AS name, 
+			repository.num_issues + repository.num_pulls AS size
+			FROM repository
+			INNER JOIN `user` owner ON repository.owner_id = owner.id
+			ORDER BY size ASC, repository.id ASC
+			''',
+		repository_users='''
+			SELECT DISTINCT user.id, user.name, user.full_name, user.email 
+			FROM `user` 
+			RIGHT JOIN `issue_user` 
+			on user.id = issue_user.uid 
+			WHERE issue_user.repo_id = %s
+			'''
+	)
+
+	def __init__(self, api: GithubAppApi, configuration: Configuration, password: str = None):
+		"""
+		:param api:             Github API the Gogs users are looked up with
+		:param configuration:   Configuration of the migration
+		:param password:        Password for the Gogs database, which is asked for if not given
+		"""
 		self.configuration = configuration
 		self.api = api
 
-		if self.configuration.get_or_default(False, "gogs", "no_password"):
-			self.logger.debug("Trying to authenticate to Gogs database without password")
-			password = None
-		else:
-			password = click.prompt(f"Please enter the MySQL password for {self.configuration.get('gogs', 'host')}")
+		if password is None:
+			password = self.prompt_password(configuration)
 
+		self.pool_size = self.configuration.get_or_default(6, "gogs", "pool_size")
 		try:
-			self.conn = mysql.connector.connect(
+			self.pool = MySQLConnectionPool(
+				pool_name="gogs",
+				pool_size=self.pool_size,
 				host=self.configuration.get("gogs", "host"),
 				db=self.configuration.get("gogs", "database"),
 				user=self.configuration.get("gogs", "username"),
-				passwd=password
+				passwd=password,
+				consume_results=True
 			)
-			self.logger.debug("Authenticated to Gogs database")
+			self.conn = self.pool.get_connection()
+			self.logger.debug(f"Authenticated to Gogs database with a pool of {self.pool_size} connections")
 		except ProgrammingError as e:
 			print(e.msg, file=sys.stderr)
 			self.logger.exception("Could not authenticate with Gogs database. Stopping migration")
 			exit(1)
 
+		self.query_count = 0
+		self.__query_count_lock = threading.Lock()
+		self.__cursors = dict()
+		self.fetch_size = self.configuration.get_or_default(1000, "gogs", "fetch_size")
+		self.prefetch_comments = self.configuration.get_or_default(False, "gogs", "prefetch_comments")
+		self.comment_batch_size = max(1, self.configuration.get_or_default(100, "gogs", "comment_batch_size"))
+		self.statements = dict(
+			self.statements,
+			comments_for_issues=self.statements["comments_for_issues"].replace(
+				"{issue_ids}", ", ".join(["%s"] * self.comment_batch_size)))
+		self.comment_connection = None
+		self.issue_rows = None
+		self.milestone_rows = None
+		self.comments_by_issue = None
+		self.labels_by_issue = None
+		self.pull_requests_by_issue = None
+
 		repo = self.configuration.get("gogs", "repository")
 		self.repo = repo if type(repo) is int else self.get_repository_id(repo)
 		self.users = self.__load_users()
 		self.code_language = self.configuration.get_or_default(None, "migration", "default_code_language")
 		self.allow_mentions = self.configuration.get_or_default(False, "migration", "mentions")
+		self.mentions = None
 		self.__load_user_from_file()
 
+	@staticmethod
+	def prompt_password(configuration: Configuration) -> str or None:
+		if configuration.get_or_default(False, "gogs", "no_password"):
+			GogsDbReader.logger.debug("Trying to authenticate to Gogs database without password")
+			return None
+		else:
+			return click.prompt(f"Please enter the MySQL password for {configuration.get('gogs', 'host')}")
+
+	@staticmethod
+	def get_repositories(configuration: Configuration, password: str or None) -> [dict]:
+		"""
+		:return:    List of the ID, name of the owner, name and number of issues and pull requests of every Gogs
+					repository, from small to large
+		"""
+		try:
+			connection = mysql.connector.connect(
+				host=configuration.get("gogs", "host"),
+				db=configuration.get("gogs", "database"),
+				user=configuration.get("gogs", "username"),
+				passwd=password)
+		except ProgrammingError as e:
+			print(e.msg, file=sys.stderr)
+			GogsDbReader.logger.exception("Could not authenticate with Gogs database. Stopping migration")
+			exit(1)
+
+		try:
+			cursor = connection.cursor(dictionary=True)
+			cursor.execute(GogsDbReader.statements["repositories"])
+			return cursor.fetchall()
+		finally:
+			connection.close()
+
 	def __load_users(self):
 		users = dict()
-		cursor = self._select('SELECT distinct name, lower_name, email FROM `user`')
+		cursor = self._select("users")
 		for user in cursor:
 			users[user['name']] = user['email']
 
@@ -83,17 +231,10 @@ class GogsDbReader(object):
 				self.api.users[user_email] = split[1]
 
 	def get_labels(self):
-		query = f'SELECT id, name, color FROM `label` WHERE repo_id={self.repo};'
-		return self._select(query)
+		return self._select("labels", self.repo)
 
 	def get_milestones(self):
-		query = f'''
-			SELECT id,name, content, is_closed, deadline_unix as deadline, closed_date_unix as closed_date 
-			FROM `milestone` 
-			WHERE milestone.repo_id={self.repo} 
-			ORDER BY id asc
-			'''
-		result = self._select(query)
+		result = self.milestone_rows if self.milestone_rows is not None else self._select("milestones", self.repo)
 		for milestone in result:
 			milestone["is_closed"] = bool(milestone["is_closed"])
 			milestone["deadline"] = self.unix_to_github_time(milestone["deadline"])
@@ -103,70 +244,235 @@ class GogsDbReader(object):
 		return result
 
 	def get_issues(self):
-		query = f'''SELECT issue.id, issue.index, issue.name, issue.content, issue.milestone_id, issue.is_closed,
-		issue.is_pull, issue.deadline_unix, issue.created_unix, issue.updated_unix,
-			creator.name as creator, assigned.name as assignee
-			FROM issue
-			LEFT JOIN user creator on issue.poster_id=creator.id
-			LEFT JOIN user assigned on issue.assignee_id=assigned.id
-			WHERE issue.repo_id = {self.repo}
-			ORDER BY issue.created_unix asc
-			'''
-		return self._select(query)
+		return self.issue_rows if self.issue_rows is not None else self._stream("issues", self.repo)
+
+	def release_issue_rows(self) -> None:
+		"""Releases the prefetched issue rows once they have been turned into issues"""
+		self.issue_rows = None
 
-	def get_comments_for_issue(self, issue_id):
-		query = f"""
-		SELECT comment.type, comment.content, comment.commit_sha, comment.created_unix, comment.updated_unix, 
-		user.name, user.email
-		FROM comment 
-		LEFT JOIN user on comment.poster_id=user.id WHERE issue_id = {issue_id} 
-		ORDER BY comment.created_unix asc
+	def get_comments_by_issue(self, issue_ids: [int]):
+		"""
+		Yields the comments of the given issues one issue at a time. Comments that were prefetched are released as soon
+		as they have been yielded. Otherwise, the comments of `comment_batch_size` issues at a time are read with a
+		single query within the snapshot of `prefetch`. Each batch is read completely before its first issue is
+		yielded, so no query is left open while the comments are migrated, and only the comments of one batch are
+		kept in memory
+
+		:param issue_ids:   IDs of the issues to read the comments of, in the order in which to yield them
+		:return:            Generator of tuples of each issue ID and the comments on that issue, in order of creation
 		"""
-		return self._select(query)
+		if self.comments_by_issue is not None:
+			for issue_id in issue_ids:
+				yield issue_id, self.comments_by_issue.pop(issue_id, [])
+			return
+
+		issue_ids = iter(issue_ids)
+		for batch in iter(lambda: list(itertools.islice(issue_ids, self.comment_batch_size)), []):
+			# Unused placeholders repeat the last issue, so the statement only has to be prepared once
+			params = batch + batch[-1:] * (self.comment_batch_size - len(batch))
+			comments = self.__group_by_issue(
+				self._select("comments_for_issues", *params, connection=self.comment_connection))
+			for issue_id in batch:
+				yield issue_id, comments.pop(issue_id, [])
 
 	def get_label_for_issue(self, issue_id):
-		query = f'''
-		SELECT distinct label.id, label.name, label.color 
-		FROM `issue_label` 
-		LEFT JOIN label on label.id = issue_label.label_id 
-		WHERE issue_label.issue_id={issue_id}
-		'''
-		return self._select(query)
-
-	def get_pull_request_for_issue(self, issue_id):
-		query = f'''
-		SELECT 
-			pull_request.type, pull_request.head_branch, pull_request.base_branch, pull_request.has_merged, 
-			pull_request.merge_base, pull_request.merged_commit_id, pull_request.merged_unix, user.name 
-		FROM pull_request 
-		LEFT JOIN user ON pull_request.merger_id=user.id 
-		WHERE pull_request.issue_id={issue_id} 
-		'''
-		return self._select(query)
+		if self.labels_by_issue is None:
+			self.labels_by_issue = self.get_labels_for_repository()
+		return self.labels_by_issue.get(issue_id, [])
 
-	def get_users_for_repository(self):
-		query = f'''
-		SELECT DISTINCT user.id, user.name, user.full_name, user.email 
-		FROM `user` 
-		RIGHT JOIN `issue_user` 
-		on user.id = issue_user.uid 
-		WHERE issue_user.repo_id={self.repo}
-		'''
+	def get_labels_for_repository(self) -> {int: [dict]}:
+		"""
+		Loads the labels of all issues and pull requests of the repository in a single query, instead of one query
+		per issue
+
+		:return:    Dictionary mapping issue IDs to the labels on that issue
+		"""
+		labels = self.__group_by_issue(self._stream("issue_labels", self.repo))
+		self.logger.debug(f"Loaded labels for {len(labels)} issues")
+		return labels
 
-		return self._select(query)
+	def get_pull_requests_for_repository(self) -> {int: [dict]}:
+		"""
+		Loads the pull request rows of all pull requests of the repository in a single query, instead of one query
+		per pull request
+
+		:return:    Dictionary mapping issue IDs to the pull request rows for that issue
+		"""
+		if self.pull_requests_by_issue is None:
+			self.pull_requests_by_issue = self.__group_by_issue(self._stream("pull_requests", self.repo))
+			self.logger.debug(f"Loaded pull request information for {len(self.pull_requests_by_issue)} pull requests")
+		return self.pull_requests_by_issue
+
+	def get_users_for_repository(self):
+		return self._select("repository_users", self.repo)
 
 	def get_repository_id(self, repo: str) -> int:
-		query = f"SELECT `id` FROM `repository` WHERE `lower_name` = '{repo}'"
-		result = self._select(query)
+		result = self._select("repository_id", repo)
 		return int(result[0]["id"])
 
-	def _select(self, query) -> list:
-		cursor = self.conn.cursor(dictionary=True)
+	@staticmethod
+	def __group_by_issue(rows: [dict]) -> {int: [dict]}:
+		grouped = dict()
+		for row in rows:
+			grouped.setdefault(row.pop("issue_id"), []).append(row)
+		return grouped
+
+	def prefetch(self) -> None:
+		"""
+		Runs the extraction queries for issues, labels, milestones and pull requests at the same time, each on its own
+		pooled connection. All readers see the same consistent snapshot of the database, so writes to a live Gogs
+		instance during extraction cannot result in a torn dataset. Comments are only included with `prefetch_comments`,
+		as they usually take up most of the memory. Otherwise, one more connection is kept in the same snapshot until
+		`release_snapshot` is called, from which the comments are read in batches while they are migrated.
+
+		With a pool of one or two connections, the queries are executed one after another within one snapshot on the
+		main connection
+		"""
+		extractions = dict(
+			issue_rows=lambda c: list(self._stream("issues", self.repo, connection=c)),
+			milestone_rows=lambda c: list(self._stream("milestones", self.repo, connection=c)),
+			labels_by_issue=lambda c: self.__group_by_issue(self._stream("issue_labels", self.repo, connection=c)),
+			pull_requests_by_issue=lambda c: self.__group_by_issue(self._stream("pull_requests", self.repo, connection=c))
+		)
+		if self.prefetch_comments:
+			extractions["comments_by_issue"] = \
+				lambda c: self.__group_by_issue(self._stream("comments", self.repo, connection=c))
+
+		start = time.perf_counter()
+		workers = min(self.pool_size - (1 if self.prefetch_comments else 2), len(extractions))
+		if workers > 1:
+			connections = [self.pool.get_connection() for _ in range(workers)]
+			self.comment_connection = None if self.prefetch_comments else self.pool.get_connection()
+		else:
+			connections = [self.conn]
+			self.comment_connection = None if self.prefetch_comments else self.conn
+		snapshot = list(connections)
+		if self.comment_connection is not None and self.comment_connection is not self.conn:
+			snapshot.append(self.comment_connection)
+		self.__start_consistent_snapshot(snapshot)
+
+		available = queue.Queue()
+		for connection in connections:
+			available.put(connection)
+
+		def extract(name):
+			connection = available.get()
+			try:
+				return name, extractions[name](connection)
+			finally:
+				available.put(connection)
+
 		try:
-			cursor.execute(query)
-			return cursor.fetchall()
+			with ThreadPoolExecutor(max_workers=len(connections)) as executor:
+				for name, result in executor.map(extract, extractions):
+					setattr(self, name, result)
+		finally:
+			for connection in connections:
+				if connection is self.comment_connection:
+					continue
+				try:
+					connection.rollback()
+				except Error:
+					# The connection was lost, which is already raised by the reader that was using it
+					pass
+				if connection is not self.conn:
+					self.__cursors.pop(id(connection), None)
+					connection.close()
+
+		self.logger.debug(
+			f"Prefetched {len(self.issue_rows)} issues and their {'comments, ' if self.prefetch_comments else ''}"
+			f"labels and pull requests with "
+			f"{len(connections)} parallel readers in {time.perf_counter() - start:.3f}s")
+
+	def release_snapshot(self) -> None:
+		"""Ends the snapshot the comments were read from, once all comments have been migrated"""
+		if self.comment_connection is None:
+			return
+		self.comment_connection.rollback()
+		if self.comment_connection is not self.conn:
+			self.__cursors.pop(id(self.comment_connection), None)
+			self.comment_connection.close()
+		self.comment_connection = None
+
+	def __start_consistent_snapshot(self, connections: list) -> None:
+		"""
+		Starts a transaction with a consistent snapshot on each of the given connections. While the snapshots are
+		started, the tables being read are locked for writing from the main connection, so all snapshots show the
+		same state of the database
+		"""
+		for connection in connections:
+			# The main connection has already read the users and the repository, and autocommit is off, so it is still in
+			# the transaction of those reads, in which no snapshot can be started
+			if connection.in_transaction:
+				connection.rollback()
+
+		if len(connections) == 1:
+			connections[0].start_transaction(consistent_snapshot=True, isolation_level="REPEATABLE READ")
+			return
+
+		locked = False
+		try:
+			self.conn.cmd_query("LOCK TABLES " + ", ".join(f"`{table}` READ" for table in self.snapshot_tables))
+			locked = True
 		except Error as e:
-			print(f"An error {e} occurred when executing the query {query}")
+			self.logger.warning(
+				f"Could not lock tables to synchronize the snapshots of the parallel readers ({e}). Readers may see "
+				f"slightly different data if the Gogs database is being written to")
+
+		try:
+			for connection in connections:
+				connection.start_transaction(consistent_snapshot=True, isolation_level="REPEATABLE READ")
+		finally:
+			if locked:
+				self.conn.cmd_query("UNLOCK TABLES")
+
+	def __prepared_cursor(self, statement: str, connection):
+		"""
+		Returns the cursor for a named statement from `statements`. Each statement is prepared on the server once per
+		connection, after which the same cursor only sends the bound parameters for every execution
+		"""
+		cursors = self.__cursors.setdefault(id(connection), dict())
+		if statement not in cursors:
+			cursors[statement] = connection.cursor(prepared=True)
+		return cursors[statement]
+
+	def _stream(self, statement: str, *params, connection=None):
+		"""
+		Executes a named statement, and yields the resulting rows as dictionaries as they are fetched from the server
+		in batches of `fetch_size` rows, so the full result never has to be held in memory at once.
+
+		The connection cannot execute other queries until all rows have been consumed. If the query fails or the
+		connection is lost while streaming, the error is raised, so a partial result is never mistaken for a complete one
+
+		:param statement:   Name of the statement in `statements` to execute
+		:param params:      Values to bind to the placeholders of the statement
+		:param connection:  Connection to execute the statement on. Defaults to the main connection
+		"""
+		with self.__query_count_lock:
+			self.query_count += 1
+		cursor = self.__prepared_cursor(statement, self.conn if connection is None else connection)
+		start, rows = time.perf_counter(), 0
+		try:
+			cursor.execute(self.statements[statement], params)
+			columns = cursor.column_names
+			batch = cursor.fetchmany(self.fetch_size)
+			while batch:
+				rows += len(batch)
+				yield from (dict(zip(columns, row)) for row in batch)
+				batch = cursor.fetchmany(self.fetch_size)
+		except Error:
+			self.logger.exception(
+				f"An error occurred after reading {rows} rows for the query {statement} with parameters {params}. "
+				f"Stopping migration")
+			raise
+
+		duration = time.perf_counter() - start
+		self.logger.debug(
+			f"Streamed {rows} rows for {statement} in {duration:.3f}s "
+			f"({rows / duration if duration else 0:.0f} rows/s). Peak RSS: {ResourceUsage.format_peak_rss()}")
+
+	def _select(self, statement: str, *params, connection=None) -> list:
+		return list(self._stream(statement, *params, connection=connection))
 
 	@staticmethod
 	def unix_to_github_time(unix_time: str or int):
@@ -188,57 +494,158 @@ class GogsDbReader(object):
 			# Weird feature that deadline seems to be set to 253402210800 (time stamp) if not present?
 			return None
 
+	def find_github_user_by_email(self, email):
+		if email is not None:
+			return self.api.find_user_by_email(email)
+
 	def find_github_user_by_name(self, user_name):
 		if user_name is not None and user_name.lower() in self.users:
 			return self.api.find_user_by_email(self.users[user_name.lower()])
 
 	def replace_references(self, content: str, issue_map: {int: int}):
-		for match in re.findall(r'#(\d+)', content):
-			if int(match) in issue_map:
-				updated_reference = issue_map[int(match)]
-				if updated_reference is None:
-					updated_reference = "<not_migrated>"
-				content = content.replace(f'#{match}', f'#{updated_reference}')
-
-		for match in re.findall(r'@([\w.\d]+)', content):
-			new_user = self.find_github_user_by_name(match.lower())
-			if new_user is not None:
-				content = content.replace(f'@{match}', self.format_user(match, new_user))
-				self.logger.debug(f"Replaced @mention of {match} to {new_user}")
-			elif match.lower() in self.api.users:
-				new_user = self.api.users[match.lower()]
-				content = content.replace(f'@{match}', self.format_user(match, new_user))
-				self.logger.debug(f"Replaced @mention of {match} to {new_user}. {match} is not a Gogs user")
-			elif match.lower() in self.users:
-				# Double check that this @ is actually an @mention, and not e.g. a decorator in some code
-				self.logger.debug(f"Replaced @mention of {match} to format specified for Github")
-				content = content.replace(f'@{match}', self.format_user(match, match))
-			else:
-				self.logger.debug(f"Found @mention for {match} not present in mapping. Leaving as is")
+		mentions = self.mentions
+		if mentions is None:
+			# Mentions were not resolved up front, so only those in this content are resolved
+			mentions = dict((name.lower(), self.__resolve_mention(name)) for name in self.mention_pattern.findall(content))
+		return self.rewrite_references(content, issue_map, mentions, self.allow_mentions, self.code_language)
+
+	@staticmethod
+	def rewrite_references(
+			content: str, issue_map: {int: int}, mentions: {str: str}, allow_mentions: bool, code_language: str or None
+	) -> str:
+		"""
+		Rewrites issue references and @mentions in a single pass, and converts implicit codeblocks. Used both by the
+		reader itself and by the render contexts of other processes, so both render exactly the same content
+
+		:param content:         Markdown to rewrite
+		:param issue_map:       Dictionary mapping Gogs issue indexes to Github issue numbers
+		:param mentions:        Dictionary mapping lower case mentioned names to the Github users to mention instead.
+								Mentions of names that are not in the table, or mapped to None, are left as they are
+		:param allow_mentions:  True iff Github users can be @mentioned
+		:param code_language:   Language for implicit codeblocks, or None to leave them as they are
+		"""
+		def replace(match: re.Match) -> str:
+			number, name = match.groups()
+			if number is not None:
+				if int(number) not in issue_map:
+					return match.group(0)
+				updated_reference = issue_map[int(number)]
+				return f'#{"<not_migrated>" if updated_reference is None else updated_reference}'
+
+			mention = mentions.get(name.lower())
+			return match.group(0) if mention is None else GogsDbReader.format_github_user(name, mention, allow_mentions)
 
-		return self.__replace_codeblocks(content, self.code_language) if self.code_language is not None else content
+		content = GogsDbReader.reference_pattern.sub(replace, content)
+		return GogsDbReader.replace_codeblocks(content, code_language) if code_language is not None else content
+
+	def prepare_mentions(self) -> None:
+		"""
+		Scans the bodies of all issues and comments for @mentions, resolves all mentioned users at once, and freezes
+		the result in a table, so rendering issues and comments does not have to search for users on Github anymore.
+		Mentions of Gogs users for which no Github account could be found are reported before anything is migrated
+		"""
+		names = dict()
+		comments = itertools.chain.from_iterable(
+			self.comments_by_issue.values() if self.comments_by_issue is not None
+			else [self._stream("comments", self.repo, connection=self.comment_connection)])
+		bodies = itertools.chain((issue["content"] for issue in self.get_issues()), (c["content"] for c in comments))
+		for body in bodies:
+			for match in self.mention_pattern.findall(body or ""):
+				names.setdefault(match.lower(), match)
+
+		self.api.find_users_by_email([self.users[name] for name in names if name in self.users])
+
+		self.mentions = MappingProxyType(dict((name, self.__resolve_mention(match)) for name, match in names.items()))
+
+		unresolved = sorted(
+			match for name, match in names.items()
+			if name in self.users and name not in self.api.users and self.find_github_user_by_name(name) is None)
+		self.logger.info(
+			f"Found {len(names)} distinct @mentions. "
+			f"{len(unresolved)} mentioned Gogs users have no Github account:" if len(unresolved) else
+			f"Found {len(names)} distinct @mentions. All mentioned Gogs users have a Github account")
+		for match in unresolved:
+			self.logger.info(f"\t@{match}")
+
+	def __resolve_mention(self, match: str) -> str or None:
+		"""
+		:param match:   Mentioned name, without @
+		:return:        Name of the Github user to mention instead, or None if the mention should be left as is
+		"""
+		new_user = self.find_github_user_by_name(match.lower())
+		if new_user is not None:
+			self.logger.debug(f"Replacing @mention of {match} with {new_user}")
+			return new_user
+		elif match.lower() in self.api.users:
+			new_user = self.api.users[match.lower()]
+			self.logger.debug(f"Replacing @mention of {match} with {new_user}. {match} is not a Gogs user")
+			return new_user
+		elif match.lower() in self.users:
+			# Double check that this @ is actually an @mention, and not e.g. a decorator in some code
+			self.logger.debug(f"Replacing @mention of {match} with format specified for Github")
+			return match
+		else:
+			self.logger.debug(f"Found @mention for {match} not present in mapping. Leaving as is")
+			return None
 
 	def format_user(self, old_user, new_user: str):
+		return self.format_github_user(old_user, new_user, self.allow_mentions)
+
+	@staticmethod
+	def format_github_user(old_user: str, new_user: str or None, allow_mentions: bool) -> str:
 		if new_user is None:
 			return f"**{old_user}**"
 		else:
-			return f'[@{new_user}](https://github.com/{new_user})' if not self.allow_mentions else f'@{new_user}'
+			return f'[@{new_user}](https://github.com/{new_user})' if not allow_mentions else f'@{new_user}'
 
-	def __replace_codeblocks(self, content, language):
-		self.logger.debug(f"Replacing implicit codeblocks to explicit codeblocks using language {language}")
+	@staticmethod
+	def replace_codeblocks(content, language):
+		"""
+		Converts codeblocks that are indented by four spaces to fenced codeblocks in the given language. Existing fenced
+		codeblocks are copied as they are. Blank lines at the end of an indented codeblock are moved after the fence
+		that closes it, and a codeblock at the end of the content is closed as well
+
+		:param content:     Markdown to convert
+		:param language:    Language of the converted codeblocks
+		:return:            Converted markdown, in which every line ends with a newline
+		"""
+		GogsDbReader.logger.debug(f"Replacing implicit codeblocks to explicit codeblocks using language {language}")
+		new_content = []
 		in_codeblock = False
-		new_content = ""
+		blank_lines = []
+		fence = None
 		for line in content.splitlines():
-			if line.startswith(" " * 4):
+			if fence is not None:
+				match = GogsDbReader.fence_pattern.match(line)
+				if match and match.group(1)[0] == fence[0] and len(match.group(1)) >= len(fence) \
+						and line[match.end():].strip() == "":
+					fence = None
+				new_content.append(line)
+			elif line.startswith(" " * 4):
 				if not in_codeblock:
-					self.logger.debug("Found implicit codeblock line: " + line)
-					new_content += f"```{language}\n"
-				in_codeblock = True
-				new_content += line[4:] + "\n"
+					GogsDbReader.logger.debug("Found implicit codeblock line: " + line)
+					new_content.append(f"```{language}")
+					in_codeblock = True
+				new_content.extend(blank_lines)
+				blank_lines.clear()
+				new_content.append(line[4:])
+			elif in_codeblock and line.strip(" ") == "":
+				blank_lines.append(line)
 			else:
-				if not line.strip(" ") == "" and in_codeblock:
-					new_content += "```\n"
+				if in_codeblock:
+					new_content.append("```")
+					new_content.extend(blank_lines)
+					blank_lines.clear()
 					in_codeblock = False
-				new_content += line + "\n"
-
-		return new_content
+				match = GogsDbReader.fence_pattern.match(line)
+				# The info string after a fence of backticks cannot contain backticks, otherwise it is inline code
+				if match and not (match.group(1)[0] == "`" and "`" in line[match.end():]):
+					fence = match.group(1)
+				new_content.append(line)
+
+		if in_codeblock:
+			new_content.append("```")
+			new_content.extend(blank_lines)
+
+		new_content.append("")
+		return "\n".join(new_content)
@@ -0,0 +1,67 @@
+import logging
+import sqlite3
+import threading
+
+
+class MigrationJournal(object):
+	"""
+	Append-only journal of everything that has been created on Github during a migration, stored in SQLite in WAL mode.
+
+	Every mapping from a Gogs milestone or issue to its Github number, and every posted comment, is committed as soon as
+	Github confirms it, so a migration that stops halfway can be resumed without creating anything twice.
+	"""
+	logger = logging.getLogger(__name__)
+
+	def __init__(self, path: str):
+		self.path = path
+		self.__lock = threading.Lock()
+		self.conn = sqlite3.connect(path, check_same_thread=False)
+		self.conn.execute("PRAGMA journal_mode=WAL")
+		# In WAL mode, committed records survive a crash of this process, while only checkpoints are synced to disk
+		self.conn.execute("PRAGMA synchronous=NORMAL")
+		self.conn.execute(
+			"CREATE TABLE IF NOT EXISTS mapping (kind TEXT NOT NULL, gogs_id INTEGER NOT NULL, github_number INTEGER, "
+			"PRIMARY KEY (kind, gogs_id))")
+		self.conn.execute("CREATE TABLE IF NOT EXISTS posted (key TEXT PRIMARY KEY, github_id INTEGER)")
+		self.conn.commit()
+
+	def is_empty(self) -> bool:
+		with self.__lock:
+			mappings = self.conn.execute("SELECT COUNT(*) FROM mapping").fetchone()[0]
+			posted = self.conn.execute("SELECT COUNT(*) FROM posted").fetchone()[0]
+		return mappings + posted == 0
+
+	def clear(self) -> None:
+		with self.__lock:
+			self.conn.execute("DELETE FROM mapping")
+			self.conn.execute("DELETE FROM posted")
+			self.conn.commit()
+
+	def record_mapping(self, kind: str, gogs_id: int, github_number: int or None) -> None:
+		"""
+		:param kind:            Type of the mapped item, e.g. `milestone` or `issue`
+		:param gogs_id:         ID or index of the item in Gogs
+		:param github_number:   Number of the item on Github, or None if the item was not migrated
+		"""
+		with self.__lock:
+			self.conn.execute(
+				"REPLACE INTO mapping (kind, gogs_id, github_number) VALUES (?, ?, ?)", (kind, gogs_id, github_number))
+			self.conn.commit()
+
+	def get_mappings(self, kind: str) -> {int: int or None}:
+		with self.__lock:
+			rows = self.conn.execute("SELECT gogs_id, github_number FROM mapping WHERE kind = ?", (kind,)).fetchall()
+		return dict(rows)
+
+	def record_posted(self, key: str, github_id: int or None = None) -> None:
+		"""
+		:param key:         Unique key of the posted comment or event
+		:param github_id:   ID of the created item on Github, if any
+		"""
+		with self.__lock:
+			self.conn.execute("REPLACE INTO posted (key, github_id) VALUES (?, ?)", (key, github_id))
+			self.conn.commit()
+
+	def get_posted(self) -> {str}:
+		with self.__lock:
+			return set(row[0] for row in self.conn.execute("SELECT key FROM posted"))
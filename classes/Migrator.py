@@ -1,8 +1,17 @@
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
 from click import progressbar
 import logging
 from classes.Configuration import Configuration
 from classes.GithubAppApi import GithubAppApi
 from classes.GogsDbReader import GogsDbReader
+from classes.MigrationJournal import MigrationJournal
+from classes.RenderContext import RenderContext
+from classes.RenderStage import RenderStage
+from classes.ResourceUsage import ResourceUsage
+from classes.SilentProgressBar import SilentProgressBar
 from classes.gogs_model.Issue import Issue
 from classes.gogs_model.PullRequest import PullRequest
 
@@ -10,70 +19,209 @@ from classes.gogs_model.PullRequest import PullRequest
 class Migrator(object):
 	logger = logging.getLogger(__name__)
 
-	def __init__(self, configuration: Configuration):
+	# Only one migration at a time can ask the user how to proceed
+	__prompt_lock = threading.Lock()
+
+	def __init__(
+			self, configuration: Configuration, import_users: str = None, export_users: str = None, resume: bool = False,
+			shared_api: GithubAppApi = None, password: str = None, show_progress: bool = True, start: bool = True
+	):
+		"""
+		:param configuration:   Configuration of the migration
+		:param import_users:    File with resolved Github users to import before migrating
+		:param export_users:    File to export the resolved Github users to after checking the user mapping
+		:param resume:          Continue the migration recorded in the journal
+		:param shared_api:      API of another migration to the same Github App installation, to share the token,
+								caches and rate limits with
+		:param password:        Password for the Gogs database, which is asked for if not given
+		:param show_progress:   Draw progress bars on the terminal. Otherwise, the progress is available from `get_status`
+		:param start:           Start the migration right away
+		"""
 		self.configuration = configuration
-		self.api = GithubAppApi(self.configuration)
-		self.gogs = GogsDbReader(self.api, self.configuration)
+		self.api = GithubAppApi(self.configuration, shared_api)
+		if import_users is not None:
+			self.api.user_cache.import_file(import_users)
+		self.gogs = GogsDbReader(self.api, self.configuration, password)
+		self.export_users = export_users
+		self.show_progress = show_progress
+		self.phase = None
+		self.progress = None
 
 		self.milestone_map = dict()
 		self.issue_map = dict()
+		self.planned_issue_map = dict()
+		self.references = self.issue_map
+		self.posted_content = dict()
+		self.prerendered = None
 		self.issues = list()
 		self.uploaded_as_pull = list()
+		self.journal = self.__open_journal(resume)
+		self.posted = self.journal.get_posted()
+		self.milestone_map.update(self.journal.get_mappings("milestone"))
+		self.issue_map.update(self.journal.get_mappings("issue"))
+		self.markers = dict()
 
 		self.__migrate_labels = self.configuration.get_or_default(False, "migration", "labels")
 		self.__migrate_milestones = self.configuration.get_migrate_milestones()
 		self.__migrate_issues = self.configuration.get_migrate_issues()
 		self.__migrate_pull_requests = self.configuration.get_migrate_pull_requests()
 
-		self.start_migration()
+		if start:
+			self.start_migration()
 
 	def start_migration(self):
 		self.check_user_mapping()
+		if self.export_users is not None:
+			self.api.user_cache.export_file(self.export_users)
+
+		if not self.api.is_shared:
+			ResourceUsage.reset_peak()
+		self.__start_phase("Reading issues, labels, milestones and pull requests from Gogs")
+		self.gogs.prefetch()
+		self.__finish_phase("reading from Gogs")
+
+		if self.__migrate_issues or self.__migrate_pull_requests:
+			self.__start_phase("Resolving @mentions")
+			self.gogs.prepare_mentions()
+			self.__finish_phase("resolving @mentions")
+
+			self.__start_phase("Looking for issues and comments that were migrated before")
+			self.markers = self.api.get_migration_markers()
+			self.__finish_phase("looking for migrated issues and comments")
 
 		if self.__migrate_labels:
-			self.logger.info("Migrating labels")
+			self.__start_phase("Migrating labels")
 			self.migrate_labels()
-			self.logger.info("Finished migrating labels")
+			self.__finish_phase("migrating labels")
 		else:
 			self.logger.info("Skipping labels")
 
 		if self.__migrate_milestones:
-			self.logger.info("Migrating milestones")
+			self.__start_phase("Migrating milestones")
 			self.migrate_milestones()
-			self.logger.info("Finished migrating milestones")
+			self.__finish_phase("migrating milestones")
 		else:
 			self.logger.info("Skipping milestones")
 
 		if self.__migrate_issues or self.__migrate_pull_requests:
 			if self.__migrate_issues and self.__migrate_pull_requests:
-				self.logger.info("Migrating issues and pull requests")
+				self.__start_phase("Migrating issues and pull requests")
 			elif self.__migrate_issues:
-				self.logger.info("Migrating issues")
+				self.__start_phase("Migrating issues")
 			else:
-				self.logger.info("Migrating pull requests")
+				self.__start_phase("Migrating pull requests")
 			self.migrate_issues()
+			self.__finish_phase("migrating issues and pull requests")
 
-			self.logger.info("Migrating comments")
+			self.__start_phase("Migrating comments")
 			self.migrate_issue_comments()
+			self.__finish_phase("migrating comments")
+			self.logger.debug(f"Migration used {self.gogs.query_count} queries on the Gogs database")
 		else:
 			self.logger.info("Skipping issues and pull requests")
+		self.gogs.release_snapshot()
+
+		if not self.api.is_shared:
+			# The session and token of migrations that share them with other migrations are reported on and stopped by
+			# the batch
+			self.api.log_connection_statistics()
+			self.api.token_manager.stop()
+
+	def __start_phase(self, phase: str) -> None:
+		self.logger.info(phase)
+		self.phase = phase
+		self.progress = None
+
+	def __finish_phase(self, phase: str) -> None:
+		"""
+		Reports the peak memory usage of a phase of the migration, which can be used to size the machine that runs
+		migrations. On Linux, the peak is reset at the end of each phase, so it only covers that phase. On other
+		platforms, it is the peak of the whole migration so far.
+
+		The peak is kept for the whole process, so it is not reported for migrations that run at the same time as other
+		migrations sharing their API. Those are reported together by the batch
+		"""
+		if self.api.is_shared:
+			self.logger.info(f"Finished {phase}")
+		else:
+			self.logger.info(f"Finished {phase}. Peak RSS: {ResourceUsage.format_peak_rss()}")
+			ResourceUsage.reset_peak()
+		self.phase = None
+		self.progress = None
+
+	def get_status(self) -> str:
+		"""
+		:return:    Description of the phase the migration is in, with the progress within that phase if known
+		"""
+		if self.phase is None:
+			return "starting" if self.progress is None else "finishing"
+		elif self.progress is None:
+			return self.phase
+		else:
+			return f"{self.phase} ({self.progress.pos}/{self.progress.length})"
+
+	def progressbar(self, iterable=None, length: int = None, **kwargs):
+		"""
+		:return:    Progress bar on the terminal, or a silent progress bar reported by `get_status` if progress is not
+					shown
+		"""
+		if self.show_progress:
+			return progressbar(iterable, length=length, **kwargs)
+		self.progress = SilentProgressBar(iterable, length)
+		return self.progress
+
+	def __open_journal(self, resume: bool) -> MigrationJournal:
+		"""
+		Opens the journal of this migration, which records everything created on Github. When resuming, the journal of
+		the previous run is replayed, so the migration continues where it stopped. In dry-run mode, nothing is created
+		on Github, so the journal is only kept in memory
+		"""
+		if self.configuration.get_or_default(True, "migration", "dryrun"):
+			return MigrationJournal(":memory:")
+
+		directory = self.configuration.get_or_default("journal", "migration", "journal_directory")
+		os.makedirs(directory, exist_ok=True)
+		journal = MigrationJournal(os.path.join(
+			directory,
+			f"{self.configuration.get('github', 'username')}_{self.configuration.get('github', 'repository')}.sqlite"))
+
+		if resume:
+			self.logger.info(f"Resuming migration from journal {journal.path}")
+		elif not journal.is_empty():
+			with self.__prompt_lock:
+				self.logger.warning(
+					f"The journal {journal.path} contains the progress of a previous migration to this repository. "
+					f"Use --resume to continue that migration without creating duplicate issues and comments")
+				response = None
+				while response not in ["Y", "n"]:
+					response = input("Do you want to discard this progress and start from the beginning? (Y/n)\n")
+
+			if response == "n":
+				exit(0)
+			journal.clear()
+
+		return journal
 
 	def check_user_mapping(self):
 		repo_users = self.gogs.get_users_for_repository()
-		missing_users = [user for user in repo_users if self.api.find_user_by_email(user['email']) is None]
+		github_users = self.api.find_users_by_email([user['email'] for user in repo_users])
+		missing_users = [user for user in repo_users if github_users.get((user['email'] or '').lower()) is None]
 
 		if len(missing_users):
-			self.logger.info("No Github accounts were found for the following Gogs users:")
-			for missing in missing_users:
-				self.logger.info(f"\t{missing['name']} ({missing['full_name']}, {missing['email']})")
-			self.logger.info(
-				"\nYou can manually map Gogs users to Github accounts by creating a file `github-accounts` (without extension),"
-				" adding one line `gogs-username <space> `github-username` for each user to be mapped, or you can continue "
-				"without these users.")
-
-			response = None
-			while response not in ["Y", "n"]:
-				response = input("Do you want to continue without these users? (Y/n)\n")
+			with self.__prompt_lock:
+				self.logger.info(
+					f"No Github accounts were found for the following Gogs users of repository "
+					f"{self.configuration.get('gogs', 'repository')}:")
+				for missing in missing_users:
+					self.logger.info(f"\t{missing['name']} ({missing['full_name']}, {missing['email']})")
+				self.logger.info(
+					"\nYou can manually map Gogs users to Github accounts by creating a file `github-accounts` (without extension),"
+					" adding one line `gogs-username <space> `github-username` for each user to be mapped, or you can continue "
+					"without these users.")
+
+				response = None
+				while response not in ["Y", "n"]:
+					response = input("Do you want to continue without these users? (Y/n)\n")
 
 			if response == "n":
 				exit(0)
@@ -85,28 +233,62 @@ class Migrator(object):
 
 	def migrate_milestones(self) -> None:
 		milestones = self.gogs.get_milestones()
-		with progressbar(milestones, item_show_func=lambda m: m['name'] if m is not None else None) as milestone_bar:
+		with self.progressbar(milestones, item_show_func=lambda m: m['name'] if m is not None else None) as milestone_bar:
 			for milestone in milestone_bar:
+				if milestone['id'] in self.milestone_map:
+					self.logger.debug(f"Milestone {milestone['id']} was already migrated in a previous run")
+					continue
 				_id = self.api.create_milestone(milestone['name'], milestone['content'], milestone['deadline'], milestone['state'])
 				self.milestone_map[milestone['id']] = _id
+				if _id is not None:
+					self.journal.record_mapping("milestone", milestone['id'], _id)
 				self.logger.debug(f"Milestone {milestone['id']} now has ID {_id} on Github")
 
 	def migrate_issues(self) -> None:
+		pull_requests = self.gogs.get_pull_requests_for_repository()
 		self.issues = [
-			PullRequest(self.api, self.gogs, row)
+			PullRequest(row, pull_requests[row["id"]])
 			if row["is_pull"] == 1
-			else Issue(self.api, self.gogs, row)
+			else Issue(row)
 			for row in self.gogs.get_issues()
 		]
+		self.gogs.release_issue_rows()
+
+		self.planned_issue_map = self.plan_issue_numbers()
+		if len(self.planned_issue_map):
+			self.references = dict(self.planned_issue_map)
+			self.references.update(self.issue_map)
+
+		# With a plan, all references are known up front, so issues can be rendered ahead of creating them
+		planned = self.references is not self.issue_map
+		with self.__create_render_stage(self.references, None if planned else 0) as render_stage, \
+				self.progressbar(self.issues, item_show_func=lambda i: i.name if i is not None else None) as issues_bar:
+			rendered = render_stage.render(
+				RenderStage.render_issues,
+				(issue for issue in self.issues if issue.index not in self.issue_map and issue.key not in self.markers),
+				self.__resolve_issue_users) if planned else None
 
-		with progressbar(self.issues, item_show_func=lambda i: i.name if i is not None else None) as issues_bar:
 			for issue in issues_bar:
 				index = None
 
+				if issue.index in self.issue_map:
+					self.logger.debug(f"Issue/pull request {issue.index} was already handled in a previous run")
+					continue
+				elif issue.key in self.markers:
+					self.issue_map[issue.index] = self.markers[issue.key]
+					self.journal.record_mapping("issue", issue.index, self.markers[issue.key])
+					self.logger.debug(
+						f"Issue/pull request {issue.index} already exists on Github as #{self.markers[issue.key]}")
+					continue
+
+				if rendered is not None:
+					_, self.prerendered = next(rendered)
+
 				if issue.is_pull:
 					if not self.configuration.migrate_by_state(issue, "pull_requests", "migrate"):
 						self.logger.debug(f"Not migrating pull request {issue.name}")
 						self.issue_map[issue.index] = None
+						self.journal.record_mapping("issue", issue.index, None)
 						continue
 					else:
 						index = self.__try_migrate_as_pull_request(issue)
@@ -123,16 +305,113 @@ class Migrator(object):
 
 				elif self.configuration.migrate_by_state(issue, "issues", "migrate"):
 					index = self.__migrate_as_issue(issue)
-					self.logger.debug(f"Issue successfully migrated. Index #{issue.index} is #{index} on Github")
+					if index is not None:
+						self.logger.debug(f"Issue successfully migrated. Index #{issue.index} is #{index} on Github")
+				else:
+					self.logger.debug(f"Not migrating issue {issue.name}")
+					self.issue_map[issue.index] = None
+					self.journal.record_mapping("issue", issue.index, None)
+					continue
 
 				self.issue_map[issue.index] = index
+				if index is not None:
+					self.journal.record_mapping("issue", issue.index, index)
+				else:
+					# Not recorded in the journal, so creating it is tried again when the migration is resumed
+					self.logger.warning(f"Failed to migrate issue/pull request {issue.index}. Skipping its comments")
+
+				if self.references is not self.issue_map and index != self.planned_issue_map.get(issue.index) \
+						and not self.api.dry_run:
+					self.logger.warning(
+						f"Issue/pull request {issue.index} was expected to become "
+						f"#{self.planned_issue_map.get(issue.index)} on Github, but became #{index}. "
+						f"References will be verified after all issues and pull requests are created")
+					self.references = self.issue_map
+
+		self.prerendered = None
+		if self.references is self.issue_map:
+			self.verify_references()
+		self.posted_content.clear()
+
+	def plan_issue_numbers(self) -> {int: int}:
+		"""
+		Predicts the number every issue and pull request that still has to be migrated will get on Github, by
+		simulating the migration in order of creation. This way, references to issues that are created later can be
+		rendered correctly right away. Pull requests are expected to be created as pull requests if both their branches
+		exist on Github
+
+		:return:    Dictionary mapping issue indexes on Gogs to the expected issue numbers on Github, or to None for
+					issues that will not be migrated
+		"""
+		number = self.api.get_next_issue_number()
+		if number is None:
+			return dict()
+
+		planned = dict()
+		for issue in self.issues:
+			if issue.index in self.issue_map:
+				continue
+			elif issue.key in self.markers:
+				planned[issue.index] = self.markers[issue.key]
+			elif self.__will_be_created(issue):
+				planned[issue.index] = number
+				number += 1
+			else:
+				planned[issue.index] = None
+
+		self.logger.debug(f"Planned the numbers of {len(planned)} issues and pull requests, up to #{number - 1}")
+		return planned
+
+	def __will_be_created(self, issue: Issue) -> bool:
+		if not issue.is_pull:
+			return self.configuration.migrate_by_state(issue, "issues", "migrate")
+		elif not self.configuration.migrate_by_state(issue, "pull_requests", "migrate"):
+			return False
+		elif self.api.branch_exists(issue.head) and self.api.branch_exists(issue.base):
+			return True
+		else:
+			return self.configuration.migrate_by_state(issue, "pull_requests", "as_issue", "migrate")
+
+	def verify_references(self) -> None:
+		"""
+		Updates the contents of issues and pull requests created in this run, in which references were rendered with
+		numbers that turned out to be wrong or unknown at the time. This is only needed if the numbers could not be
+		planned, or if the numbers on Github differ from the plan
+		"""
+		for issue in self.issues:
+			if issue.index not in self.posted_content or self.issue_map[issue.index] is None:
+				continue
+
+			index = self.issue_map[issue.index]
+			as_pull, posted_hash = self.posted_content[issue.index]
+			content = self.__render_content(issue, as_pull, self.issue_map)
+			if hash(content) != posted_hash:
+				self.logger.debug(f"Updating references in issue/pull request {issue.index} (-> #{index})")
+				self.api.update_issue_state(index, None, None, None, None, content)
+
+	def __render_content(self, issue: Issue, as_pull: bool, references: {int: int}) -> str:
+		content = issue.get_pull_request_content(self.gogs, references) if as_pull \
+			else issue.get_issue_content(self.gogs, references)
+		return self.api.add_migration_marker(content, issue.key)
+
+	def __render_posted_content(self, issue: Issue, as_pull: bool) -> str:
+		"""
+		Renders the content of an issue or pull request that is about to be created, and remembers a hash of it, so
+		the references in it can be verified later without keeping the content itself in memory
+		"""
+		if self.prerendered is not None and self.references is not self.issue_map:
+			content = self.prerendered[as_pull]
+		else:
+			content = self.__render_content(issue, as_pull, self.references)
+		self.posted_content[issue.index] = (as_pull, hash(content))
+		return content
 
 	def __try_migrate_as_pull_request(self, issue: PullRequest):
 		index = self.api.try_create_pull_request(
 			issue.name,
 			issue.head,
 			issue.base,
-			issue.get_pull_request_content(self.issue_map)
+			self.__render_posted_content(issue, True)
 		)
 
 		if index is not None:
@@ -141,11 +420,11 @@ class Migrator(object):
 			kwargs = dict(labels=None, assignees=None, milestone=None, state=None)
 
 			if self.__migrate_labels:
-				kwargs['labels'] = issue.load_labels_for_issue()
+				kwargs['labels'] = issue.load_labels_for_issue(self.gogs)
 			self.logger.debug(f"Adding labels {kwargs['labels']} to pull request")
-			if issue.get_github_assignees() is not None and self.configuration.migrate_by_state(
+			if issue.get_github_assignees(self.gogs) is not None and self.configuration.migrate_by_state(
 					issue, "pull_requests", "assignees"):
-				kwargs['assignees'] = issue.get_github_assignees()
+				kwargs['assignees'] = issue.get_github_assignees(self.gogs)
 			self.logger.debug(f"Assigning pull request to {kwargs['assignees']}")
 			if issue.milestone_id is not None and self.configuration.migrate_by_state(issue, "pull_requests", "milestones"):
 				kwargs['milestone'] = self.milestone_map[issue.milestone_id]
@@ -166,17 +445,17 @@ class Migrator(object):
 			milestone = self.milestone_map[issue.milestone_id]
 			self.logger.debug(f"Adding milestone {milestone} to issue/pull request")
 
-		labels = issue.load_labels_for_issue() if self.__migrate_labels else None
+		labels = issue.load_labels_for_issue(self.gogs) if self.__migrate_labels else None
 		if labels is not None:
 			self.logger.debug(f"Adding labels {labels} to issue/pull request")
 
 		if self.configuration.add_property_by_state(issue, "assignees"):
-			assignees = issue.get_github_assignees()
+			assignees = issue.get_github_assignees(self.gogs)
 			self.logger.debug(f"Assigning issue/pull request to {assignees}")
 
 		index = self.api.create_issue(
 			title,
-			issue.get_issue_content(self.issue_map),
+			self.__render_posted_content(issue, False),
 			assignees,
 			milestone,
 			labels
@@ -185,28 +464,102 @@ class Migrator(object):
 		return index
 
 	def migrate_issue_comments(self):
-		with progressbar(
-				self.issues,
-				item_show_func=lambda i: f"{i.name} ({len(i.comments)} issue comments)" if i is not None else None
-		) as issues_bar:
-			for issue in issues_bar:
-				issue_number = self.issue_map[issue.index]
-
-				if issue_number is None:
-					self.logger.debug(f"Issue/pull request {issue.index} was not migrated. Skipping comments")
-					continue
-
-				issue.load_comments_for_issue()
-				self.logger.debug(
-					f"{len(issue.comments)} comments loaded for issue/pull request #{issue.index} (-> #{issue_number})")
-
-				for comment in issue.comments:
-					self.api.create_issue_comment(issue_number, comment.get_comment_text(self.issue_map))
-					if comment.row['type'] == 1:
-						# Issue (re)opened
-						self.logger.debug(f"Reopening #{issue.index} (-> #{issue_number})")
-						self.api.update_issue_state(issue_number, 'open', None, None, None)
-					elif comment.row['type'] == 2:
-						# Issue closed
-						self.logger.debug(f"Closing #{issue.index} (-> #{issue_number})")
-						self.api.update_issue_state(issue_number, 'closed', None, None, None)
+		"""
+		Migrates the comments of all migrated issues and pull requests. The comments are read in batches of issues and
+		rendered in chunks on the render stage, and are released as soon as that issue is finished, so only the issues
+		that are being read, rendered or posted are kept in memory. Issues are handled in parallel by `comment_workers`
+		threads, while the comments and state changes within a single issue are always posted one after the other, in
+		their original order
+		"""
+		workers = max(1, self.configuration.get_or_default(1, "migration", "comment_workers"))
+		with ThreadPoolExecutor(max_workers=workers) as executor, \
+				self.progressbar(length=self.count_migrated_issues(), label="Issues") as issues_bar:
+			in_flight = set()
+			for issue, comments in self.get_rendered_comments():
+				if len(in_flight) >= workers:
+					done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+					for future in done:
+						future.result()
+					issues_bar.update(len(done))
+				in_flight.add(executor.submit(self.__migrate_comments_for_issue, issue, comments))
+
+			for future in in_flight:
+				future.result()
+			issues_bar.update(len(in_flight))
+
+	def count_migrated_issues(self) -> int:
+		return sum(1 for issue in self.issues if self.issue_map[issue.index] is not None)
+
+	def get_issues_with_comments(self):
+		"""
+		:return:    Generator of tuples of each migrated issue and the comment rows of that issue, read in batches of
+					issues
+		"""
+		issues = dict()
+		for issue in self.issues:
+			if self.issue_map[issue.index] is None:
+				self.logger.debug(f"Issue/pull request {issue.index} was not migrated. Skipping comments")
+			else:
+				issues[issue.id] = issue
+
+		for issue_id, rows in self.gogs.get_comments_by_issue(list(issues)):
+			yield issues.pop(issue_id), rows
+
+	def get_rendered_comments(self):
+		"""
+		Renders the comments of all migrated issues on the render stage, while they are read from Gogs
+
+		:return:    Generator of tuples of each migrated issue and its rendered comments, as returned by
+					`RenderStage.render_comments`
+		"""
+		with self.__create_render_stage(self.issue_map) as render_stage:
+			yield from render_stage.render(
+				RenderStage.render_comments, self.get_issues_with_comments(), self.__resolve_comment_users)
+
+	def __create_render_stage(self, issue_map: {int: int}, workers: int = None) -> RenderStage:
+		return RenderStage(
+			RenderContext.from_reader(self.gogs, issue_map),
+			self.configuration.get_or_default(0, "migration", "render_workers") if workers is None else workers,
+			self.configuration.get_or_default(100, "migration", "render_chunk_size"))
+
+	def __resolve_issue_users(self, issues: [Issue]) -> {str: str}:
+		"""Finds the Github users of everyone who created or was assigned to the given issues"""
+		names = [name for issue in issues for name in (issue.creator, issue.assignee) if name is not None]
+		return self.api.find_users_by_email([self.gogs.users.get(name.lower()) for name in names])
+
+	def __resolve_comment_users(self, chunk: [(Issue, [dict])]) -> {str: str}:
+		"""Finds the Github users of everyone who commented on or merged the given issues"""
+		emails = [row["email"] for _, rows in chunk for row in rows]
+		names = [merge.name for issue, _ in chunk if issue.is_pull for merge in issue.merges if merge.name is not None]
+		return self.api.find_users_by_email(emails + [self.gogs.users.get(name.lower()) for name in names])
+
+	def __migrate_comments_for_issue(self, issue: Issue, comments: [(str, int, str)]):
+		issue_number = self.issue_map[issue.index]
+		self.logger.debug(
+			f"{len(comments)} comments rendered for issue/pull request #{issue.index} (-> #{issue_number})")
+
+		for key, comment_type, text in comments:
+			if key in self.posted:
+				self.logger.debug(f"Comment {key} was already posted in a previous run")
+			elif key in self.markers:
+				self.logger.debug(f"Comment {key} already exists on Github")
+				self.journal.record_posted(key, self.markers[key])
+			else:
+				comment_id = self.api.create_issue_comment(issue_number, text)
+				if comment_id is not None:
+					self.journal.record_posted(key, comment_id)
+
+			if key + ":state" in self.posted:
+				continue
+			elif comment_type == 1:
+				# Issue (re)opened
+				self.logger.debug(f"Reopening #{issue.index} (-> #{issue_number})")
+				updated = self.api.update_issue_state(issue_number, 'open', None, None, None)
+			elif comment_type == 2:
+				# Issue closed
+				self.logger.debug(f"Closing #{issue.index} (-> #{issue_number})")
+				updated = self.api.update_issue_state(issue_number, 'closed', None, None, None)
+			else:
+				continue
+			if updated is not None:
+				self.journal.record_posted(key + ":state")
@@ -0,0 +1,85 @@
+import logging
+import threading
+import time
+
+
+class RateLimiter(object):
+	"""
+	Token bucket that paces requests to one of Github's rate limited resources (e.g. `core` or `search`).
+
+	The bucket holds at most `burst` tokens, and is refilled at the rate at which the remaining budget reported by
+	Github in the `X-RateLimit-Remaining` header can be spent until the moment the budget is reset, as reported in the
+	`X-RateLimit-Reset` header. Small numbers of requests are therefore never delayed, while long migrations spend the
+	complete budget evenly over the rate limit window, without running out before the window is reset.
+
+	Until the first response with rate limit headers has been seen, requests are not limited.
+	"""
+	logger = logging.getLogger(__name__)
+
+	def __init__(self, resource: str, burst: int = 10):
+		self.resource = resource
+		self.capacity = burst
+		self.tokens = float(burst)
+		self.rate = None
+		self.remaining = None
+		self.reset_at = None
+		self.updated_at = time.time()
+		self.__lock = threading.Lock()
+
+	def reserve(self) -> float:
+		"""
+		Takes a token from the bucket, without waiting for it to become available
+
+		:return:    Number of seconds to wait before the request the token was taken for may be sent
+		"""
+		with self.__lock:
+			now = time.time()
+			self.__refill(now)
+			if self.rate is None:
+				return 0
+
+			self.tokens -= 1
+			if self.tokens >= 0:
+				return 0
+			elif self.rate == 0:
+				return max(0.0, self.reset_at - now)
+			else:
+				return -self.tokens / self.rate
+
+	def acquire(self) -> None:
+		"""Waits until the next request may be sent"""
+		self.wait(self.reserve())
+
+	def wait(self, wait: float) -> None:
+		"""Waits for a slot that was reserved with `reserve`"""
+		if wait > 1:
+			self.logger.debug(f"Pacing requests to the {self.resource} API. Waiting {wait:.1f} seconds")
+		if wait > 0:
+			time.sleep(wait)
+
+	def update(self, headers) -> None:
+		"""
+		Adjusts the refill rate of the bucket to the rate limit headers of a response from Github
+
+		:param headers: Headers of a response from the Github API
+		"""
+		if 'X-RateLimit-Remaining' not in headers or 'X-RateLimit-Reset' not in headers:
+			return
+
+		with self.__lock:
+			now = time.time()
+			self.__refill(now)
+			self.remaining = int(headers['X-RateLimit-Remaining'])
+			self.reset_at = int(headers['X-RateLimit-Reset'])
+			self.rate = self.remaining / max(self.reset_at - now, 1)
+			# Never allow more requests than Github says are remaining
+			self.tokens = min(self.tokens, self.remaining)
+
+	def __refill(self, now: float) -> None:
+		if self.reset_at is not None and now >= self.reset_at:
+			# A new rate limit window has started, but its budget is unknown until the next response
+			self.tokens = float(self.capacity)
+			self.rate = self.remaining = self.reset_at = None
+		elif self.rate is not None:
+			self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+		self.updated_at = now
@@ -0,0 +1,48 @@
+from classes.GogsDbReader import GogsDbReader
+
+
+class RenderContext(object):
+	"""
+	Everything needed to render issues, pull requests and comments, without connections to Gogs or Github. Implements
+	the part of GogsDbReader that is used by the models to render their content, so the context can be sent to other
+	processes to render there.
+
+	Github users are looked up in the table `github_users`, which has to contain the e-mail addresses of all users
+	that are rendered. The migrator resolves these users before handing a chunk of issues or comments to the context
+	"""
+
+	def __init__(
+			self, users: {str: str}, mentions: {str: str}, code_language: str or None, allow_mentions: bool,
+			issue_map: {int: int}
+	):
+		"""
+		:param users:           Dictionary mapping the lower case names of Gogs users to their e-mail addresses
+		:param mentions:        Dictionary mapping lower case mentioned names to the Github users to mention instead
+		:param code_language:   Language for implicit codeblocks, or None to leave them as they are
+		:param allow_mentions:  True iff Github users can be @mentioned
+		:param issue_map:       Dictionary mapping Gogs issue indexes to Github issue numbers
+		"""
+		self.users = users
+		self.mentions = dict(mentions) if mentions is not None else dict()
+		self.code_language = code_language
+		self.allow_mentions = allow_mentions
+		self.issue_map = issue_map
+		self.github_users = dict()
+
+	@staticmethod
+	def from_reader(db_reader: GogsDbReader, issue_map: {int: int}):
+		return RenderContext(
+			db_reader.users, db_reader.mentions, db_reader.code_language, db_reader.allow_mentions, issue_map)
+
+	def find_github_user_by_email(self, email: str or None) -> str or None:
+		return self.github_users.get(email.lower()) if email is not None else None
+
+	def find_github_user_by_name(self, user_name: str or None) -> str or None:
+		if user_name is not None and user_name.lower() in self.users:
+			return self.find_github_user_by_email(self.users[user_name.lower()])
+
+	def replace_references(self, content: str, issue_map: {int: int}) -> str:
+		return GogsDbReader.rewrite_references(content, issue_map, self.mentions, self.allow_mentions, self.code_language)
+
+	def format_user(self, old_user: str, new_user: str or None) -> str:
+		return GogsDbReader.format_github_user(old_user, new_user, self.allow_mentions)
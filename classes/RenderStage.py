@@ -0,0 +1,131 @@
+import itertools
+import logging
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from classes.GithubAppApi import GithubAppApi
+from classes.RenderContext import RenderContext
+
+
+class RenderStage(object):
+	"""
+	Renders the content of issues, pull requests and comments in chunks on a pool of `workers` processes, while the
+	migrator sends the rendered content to Github. Results are yielded in the order of the items, and at most two
+	chunks per worker are rendered ahead, so memory stays bounded.
+
+	With 0 workers, chunks are rendered in the migrating process itself, which gives exactly the same results
+	"""
+	logger = logging.getLogger(__name__)
+
+	# Context of the current worker process, installed when the process starts
+	context = None
+
+	def __init__(self, context: RenderContext, workers: int, chunk_size: int):
+		self.render_context = context
+		self.workers = workers
+		self.chunk_size = max(1, chunk_size)
+		self.executor = None
+		self.pending = deque()
+		self.rendered = 0
+		self.render_time = 0.0
+
+	def __enter__(self):
+		if self.workers > 0:
+			# Spawn instead of fork, as the migrator runs threads that could hold locks at the moment of forking
+			self.executor = ProcessPoolExecutor(
+				max_workers=self.workers,
+				mp_context=multiprocessing.get_context("spawn"),
+				initializer=RenderStage.install,
+				initargs=(self.render_context,))
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		if self.executor is not None:
+			for future in self.pending:
+				future.cancel()
+			self.pending.clear()
+			self.executor.shutdown()
+			self.executor = None
+		if self.rendered:
+			self.logger.debug(
+				f"Rendered {self.rendered} items with {self.workers} render workers, using {self.render_time:.3f}s of "
+				f"render time ({self.rendered / self.render_time if self.render_time else 0:.0f} items/s per worker)")
+
+	def render(self, function, items, resolve_users) -> iter:
+		"""
+		:param function:        Static method of this class that renders a chunk of items
+		:param items:           Iterable of items to render, which can be a generator
+		:param resolve_users:   Function that returns a dictionary mapping the e-mail addresses of all users in a chunk
+								of items to their Github users
+		:return:                Generator of the results of `function` for each item, in the order of the items
+		"""
+		items = iter(items)
+		for chunk in iter(lambda: list(itertools.islice(items, self.chunk_size)), []):
+			github_users = resolve_users(chunk)
+			if self.executor is None:
+				yield from self.__collect(RenderStage.run(function, chunk, github_users, self.render_context))
+				continue
+
+			self.pending.append(self.executor.submit(RenderStage.run, function, chunk, github_users))
+			while len(self.pending) > 2 * self.workers:
+				yield from self.__collect(self.pending.popleft().result())
+
+		while len(self.pending):
+			yield from self.__collect(self.pending.popleft().result())
+
+	def __collect(self, result: (list, float)) -> list:
+		results, render_time = result
+		self.rendered += len(results)
+		self.render_time += render_time
+		return results
+
+	@staticmethod
+	def install(context: RenderContext) -> None:
+		RenderStage.context = context
+
+	@staticmethod
+	def run(function, chunk: list, github_users: {str: str}, context: RenderContext = None) -> (list, float):
+		"""
+		Renders a chunk with the context of this process
+
+		:return:    Tuple of the results of `function` and the time it took to render them
+		"""
+		start = time.perf_counter()
+		context = RenderStage.context if context is None else context
+		context.github_users = github_users
+		return function(chunk, context), time.perf_counter() - start
+
+	@staticmethod
+	def render_issues(chunk: list, context: RenderContext) -> list:
+		"""
+		Renders issues and pull requests with the issue map of the context. Pull requests are rendered both as pull
+		request and as issue, as it is only known which of the two will be created when the pull request is created
+
+		:return:    List of tuples of each issue and a dictionary mapping True to the content as pull request, and False to
+					the content as issue
+		"""
+		results = list()
+		for issue in chunk:
+			content = {False: issue.get_issue_content(context, context.issue_map)}
+			if issue.is_pull:
+				content[True] = issue.get_pull_request_content(context, context.issue_map)
+			results.append((issue, dict((k, GithubAppApi.add_migration_marker(v, issue.key)) for k, v in content.items())))
+		return results
+
+	@staticmethod
+	def render_comments(chunk: list, context: RenderContext) -> list:
+		"""
+		Renders the comments of issues and pull requests with the issue map of the context
+
+		:param chunk:   List of tuples of an issue and the comment rows of that issue
+		:return:        List of tuples of each issue and a list of tuples of the key, the type and the rendered text of
+						each comment on that issue, in order of creation
+		"""
+		return [
+			(issue, [
+				(comment.key, comment.type,
+					GithubAppApi.add_migration_marker(comment.get_comment_text(context, context.issue_map), comment.key))
+				for comment in issue.get_comments(rows)])
+			for issue, rows in chunk]
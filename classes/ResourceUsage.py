@@ -0,0 +1,52 @@
+import sys
+
+try:
+	import resource
+except ImportError:  # Not available on Windows
+	resource = None
+
+
+class ResourceUsage(object):
+
+	@staticmethod
+	def peak_rss_mb() -> float or None:
+		"""
+		:return:    Peak resident set size of this process in megabytes since it started, or since the last call to
+					`reset_peak`, or None if it cannot be determined on this platform
+		"""
+		try:
+			# The high water mark of the resident set is reset by `reset_peak`, unlike ru_maxrss, which also covers
+			# threads that have exited since
+			with open("/proc/self/status") as status:
+				for line in status:
+					if line.startswith("VmHWM:"):
+						return int(line.split()[1]) / 1024
+		except OSError:
+			pass
+
+		if resource is None:
+			return None
+
+		peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+		# ru_maxrss is reported in bytes on macOS, but in kilobytes on Linux
+		return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+	@staticmethod
+	def reset_peak() -> bool:
+		"""
+		Resets the peak resident set size, so the next measurement only covers what happens from now on. This is only
+		supported on Linux, where the peak is reset through /proc/self/clear_refs
+
+		:return:    True iff the peak was reset
+		"""
+		try:
+			with open("/proc/self/clear_refs", "w") as clear_refs:
+				clear_refs.write("5")
+			return True
+		except OSError:
+			return False
+
+	@staticmethod
+	def format_peak_rss() -> str:
+		peak = ResourceUsage.peak_rss_mb()
+		return "unknown" if peak is None else f"{peak:.1f} MB"
@@ -0,0 +1,70 @@
+import json
+import sqlite3
+import threading
+
+
+class ResponseCache(object):
+	"""
+	Persistent SQLite cache of responses to GET requests to the Github API, keyed by URL and query parameters.
+
+	Responses are stored together with their `ETag` and `Last-Modified` headers, which are sent back to Github as
+	`If-None-Match` and `If-Modified-Since` headers the next time the same URL is requested. If the resource did not
+	change, Github answers with `304 Not Modified`, which does not count against the rate limit, and the body is served
+	from this cache instead
+	"""
+
+	def __init__(self, path: str):
+		self.__lock = threading.Lock()
+		self.conn = sqlite3.connect(path, check_same_thread=False)
+		self.conn.execute(
+			"CREATE TABLE IF NOT EXISTS response "
+			"(key TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, link TEXT, body BLOB NOT NULL)")
+		self.conn.commit()
+
+	@staticmethod
+	def key(url: str, params: dict or None) -> str:
+		return url + "?" + json.dumps(params or dict(), sort_keys=True)
+
+	def get_validators(self, key: str) -> dict:
+		"""
+		:param key: Cache key of the request, as created by `key`
+		:return:    Conditional request headers to send with the request, or an empty dictionary if the response is
+					not cached
+		"""
+		with self.__lock:
+			row = self.conn.execute("SELECT etag, last_modified FROM response WHERE key = ?", (key,)).fetchone()
+
+		headers = dict()
+		if row is not None:
+			if row[0] is not None:
+				headers['If-None-Match'] = row[0]
+			if row[1] is not None:
+				headers['If-Modified-Since'] = row[1]
+		return headers
+
+	def get(self, key: str) -> (bytes, str or None) or None:
+		"""
+		:param key: Cache key of the request, as created by `key`
+		:return:    Tuple with the cached body and `Link` header, or None if the response is not cached
+		"""
+		with self.__lock:
+			row = self.conn.execute("SELECT body, link FROM response WHERE key = ?", (key,)).fetchone()
+		return None if row is None else (row[0], row[1])
+
+	def put(self, key: str, headers, body: bytes) -> None:
+		"""
+		Stores a response, if Github provided headers by which it can be validated later
+
+		:param key:     Cache key of the request, as created by `key`
+		:param headers: Headers of the response
+		:param body:    Body of the response
+		"""
+		etag, last_modified = headers.get('ETag'), headers.get('Last-Modified')
+		if etag is None and last_modified is None:
+			return
+
+		with self.__lock:
+			self.conn.execute(
+				"REPLACE INTO response (key, etag, last_modified, link, body) VALUES (?, ?, ?, ?, ?)",
+				(key, etag, last_modified, headers.get('Link'), body))
+			self.conn.commit()
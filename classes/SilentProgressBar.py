@@ -0,0 +1,24 @@
+class SilentProgressBar(object):
+	"""
+	Replacement for click.progressbar that does not draw anything on the terminal, but keeps track of the progress, so
+	it can be reported otherwise. Used when several repositories are migrated at the same time
+	"""
+
+	def __init__(self, iterable=None, length: int = None):
+		self.iterable = iterable
+		self.length = len(iterable) if length is None else length
+		self.pos = 0
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		pass
+
+	def __iter__(self):
+		for item in self.iterable:
+			yield item
+			self.pos += 1
+
+	def update(self, n_steps: int) -> None:
+		self.pos += n_steps
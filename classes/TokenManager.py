@@ -0,0 +1,137 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+from jose import jwt
+
+
+class TokenManager(object):
+	"""
+	Keeps the installation access token of the Github App valid for the whole migration.
+
+	Installation tokens expire after one hour, and the JWT used to request them after a few minutes. The token is
+	refreshed on a background timer `refresh_margin` seconds before it expires, using a newly generated JWT. The
+	authorization headers are replaced as a whole, so requests that are in flight or sent concurrently always use
+	either the old or the new token, both of which are valid at that time
+	"""
+	logger = logging.getLogger(__name__)
+
+	def __init__(self, app_id: int, key_file: str, session: requests.Session, base: str, refresh_margin: int = 5 * 60):
+		self.app_id = app_id
+		self.key_file = key_file
+		self.session = session
+		self.base = base
+		self.refresh_margin = refresh_margin
+
+		self.installation_id = None
+		self.expires_at = None
+		self.headers = None
+		self.__lock = threading.Lock()
+		self.__timer = None
+		self.__stopped = False
+
+	def create_jwt(self) -> str:
+		if not os.path.exists(self.key_file):
+			self.logger.critical(f"Key file {self.key_file} does not exist")
+			exit(5)
+		with open(self.key_file, 'r') as key_file_in:
+			private_pem = key_file_in.read()
+
+		payload = {
+			"iat": int(datetime.timestamp(datetime.now())),
+			"exp": int(datetime.timestamp(datetime.now())) + (9 * 60),
+			"iss": self.app_id
+		}
+		self.logger.debug(f"Generating JWT code for Github app {self.app_id} to access Github API")
+		return jwt.encode(payload, private_pem, algorithm="RS256")
+
+	def set_installation_token(self, installation_id: int, token_result: dict) -> None:
+		"""
+		Starts using an installation access token, and schedules its refresh
+
+		:param installation_id: ID of the installation of the Github App the token was created for
+		:param token_result:    Response of Github to the request for an installation access token
+		"""
+		expires_at = datetime.strptime(token_result['expires_at'], "%Y-%m-%dT%H:%M:%SZ")
+		with self.__lock:
+			self.installation_id = installation_id
+			self.expires_at = expires_at.replace(tzinfo=timezone.utc).timestamp()
+			self.headers = self.create_token_headers(token_result['token'])
+			self.__schedule(self.expires_at - self.refresh_margin - time.time())
+
+		self.logger.debug(f"Using installation token that expires at {token_result['expires_at']}")
+
+	def refresh(self) -> bool:
+		"""
+		Requests a new installation access token
+
+		:return:    True iff a new token was obtained
+		"""
+		result = self.session.post(
+			self.base + f'app/installations/{self.installation_id}/access_tokens',
+			headers=self.create_jwt_headers(self.create_jwt()))
+
+		if result.status_code != 201:
+			self.logger.warning(f"Could not refresh the installation token ({result.status_code}: {result.text})")
+			return False
+
+		self.set_installation_token(self.installation_id, result.json())
+		return True
+
+	def refresh_after_unauthorized(self, used_headers: dict) -> None:
+		"""
+		Refreshes the token after Github rejected a request as unauthorized, unless another thread has replaced the
+		token since that request was sent
+
+		:param used_headers:    Headers the rejected request was sent with
+		"""
+		with self.__lock:
+			replaced = used_headers.get('Authorization') != self.headers['Authorization']
+
+		if not replaced:
+			self.logger.info("Github rejected the installation token. Refreshing the token")
+			self.refresh()
+
+	def stop(self) -> None:
+		"""Stops refreshing the token, once no more requests will be made with it"""
+		with self.__lock:
+			self.__stopped = True
+			if self.__timer is not None:
+				self.__timer.cancel()
+				self.__timer = None
+
+	def __schedule(self, delay: float) -> None:
+		if self.__timer is not None:
+			self.__timer.cancel()
+		if self.__stopped:
+			self.__timer = None
+			return
+		self.__timer = threading.Timer(max(0.0, delay), self.__scheduled_refresh)
+		self.__timer.daemon = True
+		self.__timer.start()
+
+	def __scheduled_refresh(self) -> None:
+		try:
+			refreshed = self.refresh()
+		except requests.RequestException as e:
+			self.logger.warning(f"Could not refresh the installation token ({e})")
+			refreshed = False
+
+		if not refreshed:
+			with self.__lock:
+				self.__schedule(30)
+
+	@staticmethod
+	def create_default_headers(auth: str) -> dict:
+		return {'Accept': 'application/vnd.github.v3+json', 'Authorization': auth}
+
+	@staticmethod
+	def create_token_headers(token: str) -> dict:
+		return TokenManager.create_default_headers(f'Token {token}')
+
+	@staticmethod
+	def create_jwt_headers(jwt_token: str) -> dict:
+		return TokenManager.create_default_headers(f'Bearer {jwt_token}')
@@ -0,0 +1,86 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+
+class UserCache(object):
+	"""
+	Persistent SQLite cache of the Github logins found for e-mail addresses, so users do not have to be searched on
+	Github again in every run.
+
+	Found logins expire after `ttl` seconds. E-mail addresses for which no Github user was found are cached as well,
+	but expire after the separate `negative_ttl`, as users may make their e-mail address public in the meantime
+	"""
+	logger = logging.getLogger(__name__)
+
+	def __init__(self, path: str, ttl: int, negative_ttl: int):
+		self.ttl = ttl
+		self.negative_ttl = negative_ttl
+		self.__lock = threading.Lock()
+		self.conn = sqlite3.connect(path, check_same_thread=False)
+		self.conn.execute(
+			"CREATE TABLE IF NOT EXISTS github_user (email TEXT PRIMARY KEY, login TEXT, resolved_at REAL NOT NULL)")
+		self.conn.commit()
+
+	def get(self, email: str) -> (bool, str or None):
+		"""
+		:param email:   E-mail address to look up
+		:return:        Tuple with first element whether a non-expired entry was found, and second element the Github
+						login for the e-mail address, or None if it was found that no Github user has this address
+		"""
+		with self.__lock:
+			row = self.conn.execute(
+				"SELECT login, resolved_at FROM github_user WHERE email = ?", (email.lower(),)).fetchone()
+
+		if row is None:
+			return False, None
+
+		login, resolved_at = row
+		ttl = self.ttl if login is not None else self.negative_ttl
+		if time.time() - resolved_at > ttl:
+			return False, None
+
+		return True, login
+
+	def put(self, email: str, login: str or None) -> None:
+		with self.__lock:
+			self.conn.execute(
+				"REPLACE INTO github_user (email, login, resolved_at) VALUES (?, ?, ?)",
+				(email.lower(), login, time.time()))
+			self.conn.commit()
+
+	def import_file(self, path: str) -> None:
+		"""
+		Imports resolved users from a file with one `e-mail <space> github-username` pair per line, as written by
+		`export_file`. Lines starting with # are skipped
+		"""
+		imported = 0
+		for line in open(path, 'r'):
+			if line.startswith("#") or not line.strip():
+				continue
+			split = line.split()
+			if not len(split) == 2:
+				self.logger.error(
+					f"Could not parse line `{line.strip()}` in `{path}`. "
+					f"Format is `e-mail <space> github-username`. Skipping.")
+				continue
+			self.put(split[0], split[1])
+			imported += 1
+
+		self.logger.info(f"Imported {imported} Github users from {path}")
+
+	def export_file(self, path: str) -> None:
+		"""Exports all resolved users that have not expired to a file that can be imported with `import_file`"""
+		with self.__lock:
+			rows = self.conn.execute(
+				"SELECT email, login FROM github_user WHERE login IS NOT NULL AND resolved_at >= ? ORDER BY email",
+				(time.time() - self.ttl,)).fetchall()
+
+		with open(path, 'w') as out:
+			out.write(f"# Github users resolved by e-mail address. Format: e-mail <space> github-username{os.linesep}")
+			for email, login in rows:
+				out.write(f"{email} {login}{os.linesep}")
+
+		self.logger.info(f"Exported {len(rows)} Github users to {path}")
@@ -2,15 +2,22 @@ from classes.GogsDbReader import GogsDbReader
 
 
 class Comment(object):
+	"""
+	Comment on an issue or pull request. Only the fields needed to render the comment are kept, so the row it was read
+	from can be released
+	"""
+	__slots__ = ("id", "issue_type", "type", "name", "email", "content", "commit_sha", "created_unix", "updated_unix")
 
-	def __init__(self, db_reader: GogsDbReader, issue_type: str, row: {}):
-		self.db_reader = db_reader
+	def __init__(self, issue_type: str, row: {}):
+		self.id = row['id']
 		self.issue_type = issue_type
-		self.row = row
+		self.type = row['type']
+		self.name = row['name']
+		self.email = row['email']
 		self.content = row['content']
+		self.commit_sha = row['commit_sha']
 		self.created_unix = row['created_unix']
-		self.created = GogsDbReader.unix_to_human_time(row['created_unix'])
-		self.updated = GogsDbReader.unix_to_human_time(row['updated_unix'])
+		self.updated_unix = row['updated_unix']
 
 		"""
 			Type:
@@ -21,37 +28,40 @@ class Comment(object):
 					Only field where commit_sha is not null, so commit sha can be used
 			"""
 
-	def get_comment_text(self, issue_map: {int: int}):
-		self.content = self.db_reader.replace_references(self.content, issue_map)
-		user = self.db_reader.format_user(self.row['name'], self.db_reader.api.find_user_by_email(self.row['email']))
+	@property
+	def key(self):
+		return f"comment:{self.id}"
 
-		if self.row['type'] == 1:
-			return self.__get_opened_or_closed_comment_text(user, 'reopened')
-		elif self.row['type'] == 2:
-			return self.__get_opened_or_closed_comment_text(user, 'closed')
-		elif self.row['type'] == 4:
-			return self.__get_commit_reference_comment_text(user)
+	def get_comment_text(self, db_reader: GogsDbReader, issue_map: {int: int}):
+		content = db_reader.replace_references(self.content, issue_map)
+		user = db_reader.format_user(self.name, db_reader.find_github_user_by_email(self.email))
+		created = GogsDbReader.unix_to_human_time(self.created_unix)
+		updated = GogsDbReader.unix_to_human_time(self.updated_unix)
+
+		if self.type == 1:
+			return self.__get_opened_or_closed_comment_text(user, 'reopened', created, updated, content)
+		elif self.type == 2:
+			return self.__get_opened_or_closed_comment_text(user, 'closed', created, updated, content)
+		elif self.type == 4:
+			return self.__get_commit_reference_comment_text(user, created)
 		else:  # This should only be type 0
-			return self.__get_raw_comment_text(user)
-
-	def __get_raw_comment_text(self, user: str):
-		content = f"<sub>This comment was originally placed by {user} on _{self.created}_"
-		if self.created != self.updated:
-			content += f" and later updated on _{self.updated}_"
-		content += f"</sub>\n\n{self.content}"
-		return content
-
-	def __get_opened_or_closed_comment_text(self, user: str, new_status: str):
-		content = f"<sub>This {self.issue_type} was originally {new_status} by {user} on _{self.created}_"
-		if self.created != self.updated:
-			content += f" and later updated on _{self.updated}_"
-
-		content += f"</sub>\n\n{self.content}"
-		return content
-
-	def __get_commit_reference_comment_text(self, user):
-		try:
-			return f"{user} referenced this {self.issue_type} from commit {self.row['commit_sha']} on _{self.created}_"
-		except KeyError as e:
-			print(e)
-			return ""
+			return self.__get_raw_comment_text(user, created, updated, content)
+
+	@staticmethod
+	def __get_raw_comment_text(user: str, created: str, updated: str, content: str):
+		text = f"<sub>This comment was originally placed by {user} on _{created}_"
+		if created != updated:
+			text += f" and later updated on _{updated}_"
+		text += f"</sub>\n\n{content}"
+		return text
+
+	def __get_opened_or_closed_comment_text(self, user: str, new_status: str, created: str, updated: str, content: str):
+		text = f"<sub>This {self.issue_type} was originally {new_status} by {user} on _{created}_"
+		if created != updated:
+			text += f" and later updated on _{updated}_"
+
+		text += f"</sub>\n\n{content}"
+		return text
+
+	def __get_commit_reference_comment_text(self, user: str, created: str):
+		return f"{user} referenced this {self.issue_type} from commit {self.commit_sha} on _{created}_"
@@ -1,15 +1,17 @@
-from classes.GithubAppApi import GithubAppApi
 from classes.GogsDbReader import GogsDbReader
 from classes.gogs_model.Comment import Comment
 
 
 class Issue(object):
+	"""
+	Issue read from Gogs. Only the fields needed to migrate and render the issue are kept, so the row it was read from
+	can be released. Rendering uses the reader passed to each method, which is not referenced by the issue itself
+	"""
+	__slots__ = (
+		"id", "index", "name", "content", "milestone_id", "is_closed", "is_pull", "created_unix", "updated_unix",
+		"creator", "assignee")
 
-	def __init__(self, api: GithubAppApi, db_reader: GogsDbReader, row: dict):
-		self.api = api
-		self.db_reader = db_reader
-		self.row = row
-
+	def __init__(self, row: dict):
 		self.id = row["id"]
 		self.index = row["index"]
 		self.name = row["name"]
@@ -17,40 +19,45 @@ class Issue(object):
 		self.milestone_id = row["milestone_id"] if row["milestone_id"] > 0 else None
 		self.is_closed = row["is_closed"]
 		self.is_pull = row["is_pull"]
-		self.deadline_unix = GogsDbReader.unix_to_github_time(row["deadline_unix"])
-		self.created = GogsDbReader.unix_to_human_time(row["created_unix"])
-		self.updated = GogsDbReader.unix_to_human_time(row["updated_unix"])
+		self.created_unix = row["created_unix"]
+		self.updated_unix = row["updated_unix"]
 		self.creator = row["creator"]
 		self.assignee = row["assignee"]
 
-		self.comments = []
+	@property
+	def key(self):
+		return f"issue:{self.id}"
 
-	def load_comments_for_issue(self):
-		self.comments += \
-			[Comment(self.db_reader, self.get_type_string(), c) for c in self.db_reader.get_comments_for_issue(self.id)]
-		return self.comments
+	def get_comments(self, rows: [dict]):
+		"""
+		:param rows:    Comment rows of this issue, in order of creation
+		:return:        Generator of the comments on this issue, in order of creation
+		"""
+		return (Comment(self.get_type_string(), row) for row in rows)
 
-	def load_labels_for_issue(self):
-		return self.db_reader.get_label_for_issue(self.id)
+	def load_labels_for_issue(self, db_reader: GogsDbReader):
+		return db_reader.get_label_for_issue(self.id)
 
 	def get_type_string(self):
 		return "pull request" if self.is_pull else "issue"
 
-	def get_issue_content(self, issue_map: {int: int}):
-		content = f"<sub>{self.get_issue_footer()}</sub>\n\n"
-		content += self.db_reader.replace_references(self.content, issue_map)
+	def get_issue_content(self, db_reader: GogsDbReader, issue_map: {int: int}):
+		content = f"<sub>{self.get_issue_footer(db_reader)}</sub>\n\n"
+		content += db_reader.replace_references(self.content, issue_map)
 		return content
 
-	def get_github_assignees(self):
-		assignee = self.db_reader.find_github_user_by_name(self.assignee)
+	def get_github_assignees(self, db_reader: GogsDbReader):
+		assignee = db_reader.find_github_user_by_name(self.assignee)
 		return [assignee] if assignee is not None else None  # and assignee in self.api.users.values() else None
 
-	def get_issue_footer(self):
-		creator = self.db_reader.format_user(self.creator, self.db_reader.find_github_user_by_name(self.creator))
-		assignee = self.db_reader.format_user(self.assignee, self.db_reader.find_github_user_by_name(self.assignee))
-		footer = f"This {self.get_type_string()} was originally created by {creator} on _{self.created}_"
-		if self.created != self.updated:
-			footer += f" and later updated on {self.updated}"
+	def get_issue_footer(self, db_reader: GogsDbReader):
+		creator = db_reader.format_user(self.creator, db_reader.find_github_user_by_name(self.creator))
+		assignee = db_reader.format_user(self.assignee, db_reader.find_github_user_by_name(self.assignee))
+		created = GogsDbReader.unix_to_human_time(self.created_unix)
+		updated = GogsDbReader.unix_to_human_time(self.updated_unix)
+		footer = f"This {self.get_type_string()} was originally created by {creator} on _{created}_"
+		if created != updated:
+			footer += f" and later updated on {updated}"
 		if self.assignee is not None:
 			footer += f"\nThis {self.get_type_string()} was originally assigned to {assignee}"
 
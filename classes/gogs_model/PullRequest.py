@@ -1,32 +1,31 @@
-from classes.GithubAppApi import GithubAppApi
+import heapq
+
 from classes.GogsDbReader import GogsDbReader
 from classes.gogs_model.Issue import Issue
 from classes.gogs_model.PullRequestComment import PullRequestComment
 
 
 class PullRequest(Issue):
+	__slots__ = ("head", "base", "merges")
 
-	def __init__(self, api: GithubAppApi, db_reader: GogsDbReader, row: dict):
-		super(PullRequest, self).__init__(api, db_reader, row)
-		self.pull_requests = self.db_reader.get_pull_request_for_issue(self.id)
-		self.head = self.pull_requests[0]['head_branch']
-		self.base = self.pull_requests[0]['base_branch']
+	def __init__(self, row: dict, pull_requests: [dict]):
+		super(PullRequest, self).__init__(row)
+		self.head = pull_requests[0]['head_branch']
+		self.base = pull_requests[0]['base_branch']
+		self.merges = [
+			PullRequestComment(pull_request) for pull_request in pull_requests
+			if pull_request["merged_unix"] is not None and pull_request['merged_unix']]
 
-	def load_comments_for_issue(self):
-		super(PullRequest, self).load_comments_for_issue()
-		for pull_request in self.pull_requests:
-			if pull_request["merged_unix"] is not None and pull_request['merged_unix']:
-				self.comments.append(PullRequestComment(self.db_reader, pull_request))
-		self.comments = sorted(self.comments, key=lambda c: c.created_unix)
-		return self.comments
+	def get_comments(self, rows: [dict]):
+		return heapq.merge(super(PullRequest, self).get_comments(rows), self.merges, key=lambda c: c.created_unix)
 
-	def get_issue_content(self, issue_map: {int: int}):
+	def get_issue_content(self, db_reader: GogsDbReader, issue_map: {int: int}):
 		content = f"<sub>This issue was originally a pull request from branch `{self.head}` to branch `{self.base}`\n"
-		content += self.get_issue_footer() + "</sub>\n\n"
-		content += self.db_reader.replace_references(self.content, issue_map)
+		content += self.get_issue_footer(db_reader) + "</sub>\n\n"
+		content += db_reader.replace_references(self.content, issue_map)
 		return content
 
-	def get_pull_request_content(self, issue_map):
-		content = self.get_issue_footer() + "</sub>\n\n"
-		content += self.db_reader.replace_references(self.content, issue_map)
+	def get_pull_request_content(self, db_reader: GogsDbReader, issue_map):
+		content = self.get_issue_footer(db_reader) + "</sub>\n\n"
+		content += db_reader.replace_references(self.content, issue_map)
 		return content
@@ -7,16 +7,28 @@ class PullRequestComment(object):
 
 	Encodes references to issues or pull requests from commit messages
 	"""
+	__slots__ = ("id", "name", "head_branch", "base_branch", "merge_base", "merged_commit_id", "created_unix")
 
-	def __init__(self, db_reader: GogsDbReader, row: {}):
-		self.db_reader = db_reader
-		self.row = row
+	# Merging a pull request is not a comment type that changes the state of the issue
+	type = 0
+
+	def __init__(self, row: {}):
+		self.id = row['id']
+		self.name = row['name']
+		self.head_branch = row['head_branch']
+		self.base_branch = row['base_branch']
+		self.merge_base = row['merge_base']
+		self.merged_commit_id = row['merged_commit_id']
 		self.created_unix = row['merged_unix']
-		self.created = GogsDbReader.unix_to_human_time(row['merged_unix'])
 
-	def get_comment_text(self, issue_map):
-		user = self.db_reader.format_user(self.row['name'], self.db_reader.find_github_user_by_name(self.row['name']))
-		content = f"\nThis pull request for branch `{self.row['head_branch']}` was merged into "
-		content += f"commit {self.row['merge_base']} of branch `{self.row['base_branch']}` "
-		content += f"in commit {self.row['merged_commit_id']} by {user} on _{self.created}_"
+	@property
+	def key(self):
+		return f"merge:{self.id}"
+
+	def get_comment_text(self, db_reader: GogsDbReader, issue_map):
+		user = db_reader.format_user(self.name, db_reader.find_github_user_by_name(self.name))
+		created = GogsDbReader.unix_to_human_time(self.created_unix)
+		content = f"\nThis pull request for branch `{self.head_branch}` was merged into "
+		content += f"commit {self.merge_base} of branch `{self.base_branch}` "
+		content += f"in commit {self.merged_commit_id} by {user} on _{created}_"
 		return content
@@ -4,6 +4,8 @@ import time
 
 import click
 
+from classes.AsyncMigrator import AsyncMigrator
+from classes.BatchMigrator import BatchMigrator
 from classes.Configuration import Configuration
 from classes.Migrator import Migrator
 
@@ -14,8 +16,24 @@ from classes.Migrator import Migrator
 	type=click.Path(exists=True),
 	required=True,
 	help="Specify the location of the configuration (TOML) file", default='migration-settings.toml')
+@click.option(
+	"--import-users",
+	type=click.Path(exists=True),
+	help="Import Github users resolved by e-mail address from a file written with --export-users")
+@click.option(
+	"--export-users",
+	type=click.Path(),
+	help="Export the Github users resolved by e-mail address to a file after the user mapping has been checked")
+@click.option(
+	"--resume",
+	is_flag=True,
+	help="Continue a migration that stopped halfway, using the journal of the previous run")
+@click.option(
+	"--batch",
+	is_flag=True,
+	help="Migrate all repositories listed in the `batch` section of the configuration at the same time")
 @click.version_option()
-def migrate(config):
+def migrate(config, import_users, export_users, resume, batch):
 	"""Command line tool for migrating labels, milestones, issues, and pull requests from a Gogs MySQL database to Github.
 	Requires read access on the Gogs database, and a Github app with write access on issues and pull requests to the
 	target repository.
@@ -64,7 +82,13 @@ def migrate(config):
 	logger.addHandler(ch)
 	logger.addHandler(fh)
 
-	Migrator(Configuration(click.format_filename(config)))
+	configuration = Configuration(click.format_filename(config))
+	if batch:
+		BatchMigrator(configuration, import_users=import_users, export_users=export_users, resume=resume)
+		return
+
+	engine = AsyncMigrator if configuration.get_or_default("threads", "migration", "engine") == "async" else Migrator
+	engine(configuration, import_users=import_users, export_users=export_users, resume=resume)
 
 
 if __name__ == "__main__":
@@ -11,8 +11,12 @@ setup(
 		'python-jose~=3.2.0',
 		'requests~=2.25.0',
 		'setuptools~=51.3.1',
-		'toml~=0.10.2'
+		'toml~=0.10.2',
+		'urllib3>=1.26'
 	],
+	extras_require={
+		'async': ['httpx>=0.18']
+	},
 	entry_points='''
 		[console_scripts]
 		gogs-to-github=migrator:migrate